@@ -1,11 +1,11 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-import models, database
+from sqlalchemy.orm import Session, make_transient_to_detached
+import models, database, hashing
+from cache import TTLCache
 
 import os
 
@@ -14,7 +14,15 @@ SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey") # Loads from Env Var, fal
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 # 1 day
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Authenticated users are cached per worker so each request doesn't re-query them.
+# Changes made through this worker invalidate immediately; other workers see them within the TTL.
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+# Request handlers use the async versions in hashing.py, which run on a process pool.
+# These synchronous helpers are for scripts such as seed_data.
+pwd_context = hashing.pwd_context
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 def verify_password(plain_password, hashed_password):
@@ -46,8 +54,28 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user_id = payload.get("uid")
+
+    if user_id is not None:
+        cached = principal_cache.get(user_id)
+        if cached is not None:
+            # Attach a copy to this request's session without a query
+            return db.merge(cached, load=False)
+        user = db.get(models.User, user_id)
+    else:
+        # Tokens issued before the user id was embedded
+        user = db.query(models.User).filter(models.User.email == email).first()
     if user is None:
         raise credentials_exception
+    principal_cache.set(user.id, _snapshot(user))
     return user
+
+def _snapshot(user: models.User) -> models.User:
+    # Detached copy of the column values, safe to share between requests
+    copy = models.User(**{c.key: getattr(user, c.key) for c in models.User.__table__.columns})
+    make_transient_to_detached(copy)
+    return copy
+
+def invalidate_user(user_id: int):
+    """Call after changing a user's role, approval or credentials."""
+    principal_cache.delete(user_id)
@@ -0,0 +1,390 @@
+"""Mixed-workload load test of the whole API over HTTP and WebSockets.
+
+Run from backend/ (needs httpx: pip install httpx):
+
+    python -m benchmarks.api_load [--products 2000] [--concurrency 32] [--seconds 10]
+                                  [--subscribers 200] [--scenarios browse search ...]
+                                  [--database-url postgresql://localhost/vortex_bench]
+
+Starts uvicorn on a free port against a scratch SQLite file, or against
+--database-url (a local Postgres you don't mind filling with test rows).
+The database is seeded with seed_data.seed() plus a synthetic_data
+dataset of --products listings. Each scenario then runs for --seconds
+with --concurrency clients:
+
+  browse     GET /products with random filters and sorts, sometimes a second page
+  search     GET /products?search= with words from the synthetic titles
+  bid_burst  every client bidding on the same hot auction
+  ws_fanout  --subscribers sockets on the hot auction while one client bids;
+             latency is from sending the bid to each socket receiving it,
+             "ok" counts deliveries and "rejected" deliveries that never came
+  purchase   buyers buying distinct direct listings
+
+Throughput and p50/p95/p99 latency are printed per scenario and saved to
+benchmarks/results/<timestamp>-<commit>.json; the report is compared with
+the previous results file so a regression shows up as a delta. Rejected
+bids and sold-out purchases are expected outcomes and counted separately
+from errors.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import httpx
+import websockets
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+SCENARIOS = ["browse", "search", "bid_burst", "ws_fanout", "purchase"]
+PASSWORD = "password123"
+
+CATEGORIES = ["Antiques", "Coins", "Stamps", "Watches", "Electronics", "Art", "Books", "Cameras"]
+# Words that appear in synthetic_data titles and descriptions
+WORDS = ["vintage", "rare", "mughal", "brass", "camera", "watch", "stamp", "coin", "antique",
+         "classic", "limited", "original", "signed", "mint", "restored", "certificate", "collection"]
+SORTS = ["newest", "oldest", "price_asc", "price_desc", "ending_soon"]
+
+
+# --- Setup ---
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _seed(products: int, buyers: int) -> dict:
+    """Seeds the database named by DATABASE_URL; returns what the scenarios need to know."""
+    import migrate
+    import models
+    import seed_data
+    import synthetic_data
+    from database import SessionLocal
+
+    migrate.upgrade()
+    seed_data.seed()
+    # Enough users that every client gets its own buyer account
+    users = max(synthetic_data.SELLER_EVERY, buyers * 2)
+    created = synthetic_data.generate(users, products, bids=products * 5)
+    user_ids = range(created["first_user_id"], created["first_user_id"] + users)
+    buyer_emails = [synthetic_data.email(u) for u in user_ids if not synthetic_data.is_seller(u)][:buyers]
+
+    db = SessionLocal()
+    try:
+        seller = db.query(models.User).filter(models.User.email == "king@vortex.com").first()
+        hot = models.Product(
+            title="Hot auction", description="benchmark", category="Bench", images=[],
+            listing_type="auction", status="active", start_bid=1.0, current_highest_bid=1.0,
+            min_bid_increment=1.0, seller_id=seller.id, end_time=datetime.utcnow() + timedelta(days=1),
+        )
+        db.add(hot)
+        db.commit()
+        direct_ids = [pid for (pid,) in db.query(models.Product.id).filter(
+            models.Product.listing_type == "direct", models.Product.status == "active").all()]
+        return {"hot_auction": hot.id, "buyers": buyer_emails, "direct_ids": direct_ids}
+    finally:
+        db.close()
+
+
+class Server:
+    def __init__(self, database_url: str):
+        self.port = _free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        env = dict(os.environ, DATABASE_URL=database_url, BCRYPT_ROUNDS=os.getenv("BCRYPT_ROUNDS", "4"))
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(self.port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env,
+        )
+
+    def wait_ready(self, timeout: float = 30):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("API server exited during startup")
+            try:
+                if httpx.get(self.base_url + "/products?limit=1").status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError("API server did not start")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+# --- Measurement ---
+
+class Recorder:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.ok = 0
+        self.rejected = 0
+        self.errors = 0
+
+    def record(self, started: float, outcome: str):
+        self.latencies.append(time.perf_counter() - started)
+        setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def summary(self, seconds: float) -> dict:
+        latencies = sorted(self.latencies)
+        result = {
+            "requests": len(latencies),
+            "ok": self.ok,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "throughput": round(len(latencies) / seconds, 1),
+        }
+        if len(latencies) >= 2:
+            cuts = statistics.quantiles(latencies, n=100)
+            result.update(p50_ms=round(cuts[49] * 1000, 2), p95_ms=round(cuts[94] * 1000, 2), p99_ms=round(cuts[98] * 1000, 2))
+        return result
+
+
+async def _request(client: httpx.AsyncClient, recorder: Recorder, method: str, url: str, expected=(), **kwargs):
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.HTTPError:
+        recorder.record(started, "errors")
+        return None
+    if response.status_code < 300:
+        recorder.record(started, "ok")
+    elif response.status_code in expected:
+        recorder.record(started, "rejected")
+    else:
+        recorder.record(started, "errors")
+    return response
+
+
+async def _until(deadline: float, concurrency: int, worker):
+    async def loop(n):
+        while time.perf_counter() < deadline:
+            await worker(n)
+    await asyncio.gather(*(loop(n) for n in range(concurrency)))
+
+
+# --- Scenarios ---
+
+async def browse(ctx, client, recorder, deadline):
+    async def worker(n):
+        params = {"sort": random.choice(SORTS)}
+        if random.random() < 0.5:
+            params["category"] = random.choice(CATEGORIES)
+        if random.random() < 0.3:
+            params["listing_type"] = random.choice(["auction", "direct"])
+        response = await _request(client, recorder, "GET", "/products", params=params)
+        if response is not None and response.status_code == 200 and random.random() < 0.3:
+            cursor = response.json().get("next_cursor")
+            if cursor:
+                await _request(client, recorder, "GET", "/products", params={**params, "cursor": cursor})
+    await _until(deadline, ctx["concurrency"], worker)
+
+
+async def search(ctx, client, recorder, deadline):
+    async def worker(n):
+        terms = " ".join(random.sample(WORDS, random.randint(1, 2)))
+        await _request(client, recorder, "GET", "/products", params={"search": terms})
+    await _until(deadline, ctx["concurrency"], worker)
+
+
+_MIN_BID = re.compile(r"at least ([\d.]+)")
+
+
+async def bid_burst(ctx, client, recorder, deadline):
+    url = f"/products/{ctx['hot_auction']}/bid"
+    price = {"value": float((await client.get(f"/products/{ctx['hot_auction']}")).json()["current_highest_bid"])}
+
+    async def worker(n):
+        amount = price["value"] + 1 + random.randint(0, 3)
+        response = await _request(client, recorder, "POST", url, expected=(400,),
+                                  json={"amount": amount}, headers=ctx["headers"][n % len(ctx["headers"])])
+        if response is None:
+            return
+        if response.status_code == 200:
+            price["value"] = max(price["value"], amount)
+        elif match := _MIN_BID.search(response.text):
+            price["value"] = max(price["value"], float(match.group(1)) - 1)
+    await _until(deadline, ctx["concurrency"], worker)
+
+
+async def ws_fanout(ctx, client, recorder, deadline):
+    product_id = ctx["hot_auction"]
+    ws_url = ctx["base_url"].replace("http", "ws", 1) + f"/ws/bids/{product_id}"
+    sent: Dict[float, float] = {}
+    sockets = [await websockets.connect(ws_url) for _ in range(ctx["subscribers"])]
+
+    async def listen(ws):
+        try:
+            async for raw in ws:
+                message = json.loads(raw)
+                if message.get("type") == "new_bid" and message["amount"] in sent:
+                    recorder.record(sent[message["amount"]], "ok")
+        except websockets.ConnectionClosed:
+            pass
+
+    listeners = [asyncio.create_task(listen(ws)) for ws in sockets]
+    price = float((await client.get(f"/products/{product_id}")).json()["current_highest_bid"])
+    bids = 0
+    while time.perf_counter() < deadline:
+        price += 1
+        sent[price] = time.perf_counter()
+        response = await client.post(f"/products/{product_id}/bid", json={"amount": price}, headers=ctx["headers"][0])
+        if response.status_code != 200:
+            recorder.errors += 1
+            match = _MIN_BID.search(response.text)
+            price = float(match.group(1)) - 1 if match else price
+            continue
+        bids += 1
+    await asyncio.sleep(1)  # let the last deliveries arrive
+    for ws in sockets:
+        await ws.close()
+    await asyncio.gather(*listeners)
+    # Every accepted bid should have reached every socket
+    recorder.rejected = bids * len(sockets) - recorder.ok
+
+
+async def purchase(ctx, client, recorder, deadline):
+    # Each client owns a slice of the direct listings, so contention doesn't turn every buy into a 400
+    ids = list(ctx["direct_ids"])
+    random.shuffle(ids)
+    slices = [ids[n::ctx["concurrency"]] for n in range(ctx["concurrency"])]
+
+    async def worker(n):
+        if not slices[n]:
+            await asyncio.sleep(0.01)
+            return
+        product_id = slices[n].pop()
+        await _request(client, recorder, "POST", f"/products/{product_id}/buy", expected=(400,),
+                       headers=ctx["headers"][n % len(ctx["headers"])])
+    await _until(deadline, ctx["concurrency"], worker)
+
+
+# --- Reporting ---
+
+def _commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _previous_results() -> dict:
+    if not os.path.isdir(RESULTS_DIR):
+        return {}
+    files = sorted(f for f in os.listdir(RESULTS_DIR) if f.endswith(".json"))
+    if not files:
+        return {}
+    with open(os.path.join(RESULTS_DIR, files[-1])) as f:
+        return json.load(f)
+
+
+def _delta(new, old) -> str:
+    if new is None or not old:
+        return ""
+    return f"{(new - old) / old * 100:+.0f}%"
+
+
+def _report(results: dict, previous: dict):
+    baseline = previous.get("scenarios", {})
+    if previous:
+        print(f"\nCompared with {previous['meta']['commit']} ({previous['meta']['started']})")
+    print(f"{'scenario':<10} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'ok':>7} {'rejected':>9} {'errors':>7}  vs previous")
+    for name, r in results["scenarios"].items():
+        old = baseline.get(name, {})
+        changes = " ".join(filter(None, [
+            f"req/s {_delta(r['throughput'], old.get('throughput'))}" if old else "",
+            f"p95 {_delta(r.get('p95_ms'), old.get('p95_ms'))}" if old.get("p95_ms") else "",
+        ]))
+        print(f"{name:<10} {r['throughput']:>9} {r.get('p50_ms', '-'):>8} {r.get('p95_ms', '-'):>8} "
+              f"{r.get('p99_ms', '-'):>8} {r['ok']:>7} {r['rejected']:>9} {r['errors']:>7}  {changes}")
+
+
+async def _run(args, ctx) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=ctx["base_url"], limits=limits, timeout=30) as client:
+        ctx["headers"] = []
+        for email in ctx["buyers"]:
+            token = (await client.post("/auth/login", json={"email": email, "password": PASSWORD})).json()["access_token"]
+            ctx["headers"].append({"Authorization": f"Bearer {token}"})
+        scenarios = {}
+        for name in args.scenarios:
+            recorder = Recorder()
+            started = time.perf_counter()
+            await globals()[name](ctx, client, recorder, started + args.seconds)
+            scenarios[name] = recorder.summary(time.perf_counter() - started)
+        return scenarios
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", help="Local database to run against (default: scratch SQLite file)")
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--subscribers", type=int, default=200)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    args = parser.parse_args()
+
+    scratch = None
+    database_url = args.database_url
+    if not database_url:
+        scratch = tempfile.TemporaryDirectory()
+        database_url = f"sqlite:///{os.path.join(scratch.name, 'bench.db')}"
+    # Set before the backend modules are imported: database.py reads it at import time
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+    sys.path.insert(0, BACKEND_DIR)
+
+    started_at = datetime.now().isoformat(timespec="seconds")
+    print(f"Seeding {args.products} products into {database_url.split('@')[-1]} ...")
+    ctx = _seed(args.products, buyers=args.concurrency)
+    server = Server(database_url)
+    try:
+        server.wait_ready()
+        ctx.update(base_url=server.base_url, concurrency=args.concurrency, subscribers=args.subscribers)
+        scenarios = asyncio.run(_run(args, ctx))
+    finally:
+        server.stop()
+        if scratch is not None:
+            scratch.cleanup()
+
+    results = {
+        "meta": {
+            "commit": _commit(),
+            "started": started_at,
+            "database": database_url.split(":", 1)[0],
+            "products": args.products,
+            "concurrency": args.concurrency,
+            "seconds": args.seconds,
+            "subscribers": args.subscribers,
+        },
+        "scenarios": scenarios,
+    }
+    previous = _previous_results()
+    _report(results, previous)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{started_at.replace(':', '')}-{results['meta']['commit']}.json")
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved {os.path.relpath(path, BACKEND_DIR)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""Bids per second on one hot SQLite auction, committed per bid vs write-behind, plus a crash test.
+
+Run from backend/:
+
+    python -m benchmarks.bid_write_behind [--bidders 64] [--seconds 10] [--skip-crash]
+
+Each mode gets a fresh scratch database and --bidders concurrent bidders on
+the same auction, calling what POST /products/{id}/bid awaits:
+
+  sync            bidding.place_bid in the threadpool, one commit per bid
+  journal         write_behind.WriteBehindBidLog, acknowledged once journaled
+  commit          the same, acknowledged once its group commit is done
+
+The crash test starts a bidding process with a long flush interval, kills
+it with SIGKILL after it has acknowledged a few hundred bids, replays the
+journal as the next startup would, and checks that every acknowledged bid
+is in the bids table, the auction's price is the highest of them, and the
+dashboard aggregates equal a rebuild.
+"""
+import argparse
+import asyncio
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import sessionmaker
+
+import bidding
+import dashboard
+import database
+import models
+import write_behind
+
+CRASH_AFTER_ACKS = 300
+
+
+def _setup(path: str) -> sessionmaker:
+    engine = database.create_db_engine(f"sqlite:///{path}")
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    db = Session()
+    seller = models.User(username="seller", email="seller@bench", hashed_password="x", role="seller")
+    db.add(seller)
+    db.add_all([models.User(username=f"bidder{i}", email=f"bidder{i}@bench", hashed_password="x", role="buyer")
+                for i in range(256)])
+    db.flush()
+    db.add(models.Product(
+        title="Hot auction", description="bench", category="Bench", listing_type="auction",
+        status="active", current_highest_bid=0.0, min_bid_increment=1.0, seller_id=seller.id,
+        end_time=datetime.utcnow() + timedelta(days=1),
+    ))
+    db.commit()
+    db.close()
+    return Session
+
+
+async def _burst(place, bidders: int, seconds: float) -> dict:
+    counts = {"bids": 0, "rejected": 0}
+    price = [0.0]
+    latencies = []
+    deadline = time.perf_counter() + seconds
+
+    async def bidder(user_id):
+        while time.perf_counter() < deadline:
+            # A request yields to the loop at least once; without it, bids accepted
+            # purely in memory would never let the flusher run
+            await asyncio.sleep(0)
+            amount = price[0] + random.randint(1, 5)
+            started = time.perf_counter()
+            try:
+                await place(user_id, amount)
+            except HTTPException:
+                # Outbid: look at the new price before trying again, as a client would
+                counts["rejected"] += 1
+                await asyncio.sleep(0.001)
+                continue
+            latencies.append(time.perf_counter() - started)
+            counts["bids"] += 1
+            price[0] = max(price[0], amount)
+
+    await asyncio.gather(*(bidder(i + 2) for i in range(bidders)))
+    latencies.sort()
+    return {
+        **counts,
+        "bids_per_sec": round(counts["bids"] / seconds, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 2) if latencies else None,
+    }
+
+
+async def _sync(Session, bidders: int, seconds: float) -> dict:
+    def place(user_id, amount):
+        # A session per bid, as get_db gives each request
+        db = Session()
+        try:
+            return bidding.place_bid(db, 1, user_id, amount)
+        finally:
+            db.close()
+
+    return await _burst(lambda user_id, amount: run_in_threadpool(place, user_id, amount), bidders, seconds)
+
+
+async def _write_behind(Session, journal: str, ack_after: str, bidders: int, seconds: float) -> dict:
+    log = write_behind.WriteBehindBidLog(Session, journal, ack_after=ack_after)
+    await log.start()
+    started = time.perf_counter()
+    result = await _burst(lambda user_id, amount: log.place(1, user_id, amount), bidders, seconds)
+    # Sustained rate: until every accepted bid is in the table
+    await log.stop()
+    result["committed_per_sec"] = round(result["bids"] / (time.perf_counter() - started), 1)
+    stats = log.snapshot()
+    for key in ("batches", "largest_batch", "throttled"):
+        result[key] = stats[key]
+    return result
+
+
+def _check_stored(Session, expected_bids: int) -> str:
+    db = Session()
+    try:
+        stored = db.query(models.Bid).count()
+        price = db.query(models.Product.current_highest_bid).filter(models.Product.id == 1).scalar()
+        top = db.query(models.Bid.amount).order_by(models.Bid.amount.desc()).limit(1).scalar()
+    finally:
+        db.close()
+    ok = stored == expected_bids and price == top
+    return f"stored {stored} bids, price {price}: {'ok' if ok else 'MISMATCH'}"
+
+
+# --- Crash test ---
+
+async def _crash_child(db_path: str, journal: str):
+    # Flushes rarely, so most acknowledged bids are only in the journal when the kill comes
+    Session = sessionmaker(bind=database.create_db_engine(f"sqlite:///{db_path}"), autoflush=False)
+    log = write_behind.WriteBehindBidLog(Session, journal, max_batch=10000, interval_ms=250)
+    await log.start()
+    amount = 0.0
+    while True:
+        amount += 1
+        bid = await log.place(1, random.randint(2, 257), amount)
+        # Only what is printed counts as acknowledged
+        sys.stdout.write(f"{bid.id} {bid.amount}\n")
+        sys.stdout.flush()
+        await asyncio.sleep(0)
+
+
+def _crash_test() -> bool:
+    directory = tempfile.mkdtemp()
+    db_path = os.path.join(directory, "bench.db")
+    journal = os.path.join(directory, "bid_journal.log")
+    Session = _setup(db_path)
+
+    child = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.bid_write_behind", "--crash-child", db_path, journal],
+        stdout=subprocess.PIPE, text=True,
+    )
+    acked = {}
+    for line in child.stdout:
+        bid_id, amount = line.split()
+        acked[int(bid_id)] = float(amount)
+        if len(acked) >= CRASH_AFTER_ACKS:
+            break
+    child.send_signal(signal.SIGKILL)
+    child.wait()
+
+    db = Session()
+    before = db.query(models.Bid).count()
+    db.close()
+    log = write_behind.WriteBehindBidLog(Session, journal)
+    replayed = log.recover()
+    again = log.recover()
+
+    db = Session()
+    try:
+        stored = dict(db.query(models.Bid.id, models.Bid.amount).filter(models.Bid.id.in_(acked)))
+        price = db.query(models.Product.current_highest_bid).filter(models.Product.id == 1).scalar()
+        incremental = {row.user_id: (row.active_bids, row.winning_bids) for row in db.query(models.BuyerStats)}
+        dashboard.rebuild(db)
+        rebuilt = {row.user_id: (row.active_bids, row.winning_bids) for row in db.query(models.BuyerStats)}
+        db.rollback()
+    finally:
+        db.close()
+
+    missing = [bid_id for bid_id, amount in acked.items() if stored.get(bid_id) != amount]
+    ok = not missing and price >= max(acked.values()) and incremental == rebuilt and again == 0
+    print(f"crash     acknowledged {len(acked)}, in db at kill {before}, replayed {replayed}, "
+          f"missing {len(missing)}, price {price}, dashboard {'matches' if incremental == rebuilt else 'DRIFTED'}: "
+          f"{'ok' if ok else 'FAILED'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bidders", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--skip-crash", action="store_true")
+    parser.add_argument("--crash-child", nargs=2, metavar=("DB", "JOURNAL"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.crash_child:
+        asyncio.run(_crash_child(*args.crash_child))
+        return
+
+    for mode in ("sync", "journal", "commit"):
+        directory = tempfile.mkdtemp()
+        Session = _setup(os.path.join(directory, "bench.db"))
+        if mode == "sync":
+            result = asyncio.run(_sync(Session, args.bidders, args.seconds))
+        else:
+            journal = os.path.join(directory, "bid_journal.log")
+            result = asyncio.run(_write_behind(Session, journal, mode, args.bidders, args.seconds))
+        print(f"{mode:9s} {result}")
+        print(f"{'':9s} {_check_stored(Session, result['bids'])}")
+
+    if not args.skip_crash and not _crash_test():
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Concurrent bid/read load against SQLite with default vs tuned engine settings.
+
+Run from backend/:
+
+    python -m benchmarks.db_pool_load [--threads 16] [--seconds 10]
+
+Each run uses a fresh scratch database file. Worker threads mix bids on one
+hot auction (writes) with catalogue page reads, the shape that used to hit
+"database is locked". The tuned engine is database.create_db_engine() (WAL,
+busy_timeout, synchronous=NORMAL, sized pool); the baseline is a plain
+create_engine() as database.py used to build.
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import bidding
+import database
+import models
+
+
+def _setup(engine):
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    seller = models.User(username="seller", email="seller@bench", hashed_password="x", role="seller")
+    db.add(seller)
+    db.flush()
+    for i in range(200):
+        db.add(models.Product(
+            title=f"Product {i}", description="bench", category="Bench", listing_type="auction",
+            status="active", current_highest_bid=0.0, min_bid_increment=1.0, seller_id=seller.id,
+            end_time=datetime.utcnow() + timedelta(days=1),
+        ))
+    db.commit()
+    db.close()
+
+
+def _run(engine, threads: int, seconds: float) -> dict:
+    Session = sessionmaker(bind=engine, autoflush=False)
+    counts = {"bids": 0, "rejected": 0, "reads": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(user_id):
+        db = Session()
+        local = dict.fromkeys(counts, 0)
+        while time.perf_counter() < deadline:
+            try:
+                if random.random() < 0.5:
+                    hot = db.query(models.Product.current_highest_bid).filter(models.Product.id == 1).scalar()
+                    bidding.place_bid(db, 1, user_id, hot + random.randint(1, 5))
+                    local["bids"] += 1
+                else:
+                    db.query(models.Product).filter(models.Product.status == "active") \
+                        .order_by(models.Product.created_at.desc()).limit(20).all()
+                    db.rollback()
+                    local["reads"] += 1
+            except HTTPException:
+                local["rejected"] += 1
+            except Exception:
+                db.rollback()
+                local["errors"] += 1
+        db.close()
+        with lock:
+            for key, value in local.items():
+                counts[key] += value
+
+    workers = [threading.Thread(target=worker, args=(i + 1,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    ops = counts["bids"] + counts["rejected"] + counts["reads"]
+    return {**counts, "ops_per_sec": round(ops / seconds, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    configs = {
+        "baseline": lambda url: create_engine(url, connect_args={"check_same_thread": False}),
+        "tuned": lambda url: database.create_db_engine(url),
+    }
+    for name, make_engine in configs.items():
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        engine = make_engine(f"sqlite:///{path}")
+        _setup(engine)
+        result = _run(engine, args.threads, args.seconds)
+        print(f"{name:9s} {result}")
+        if name == "tuned":
+            print(f"{'':9s} pool {database.pool_status(engine)}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""ORM + from_orm + response_model re-validation vs the lean column path for list responses.
+
+Run from backend/:
+
+    python -m benchmarks.list_serialization [--rows 1000 10000] [--repeat 5]
+
+For each size a scratch SQLite database is filled with that many products
+and one page holding all of them is produced both ways, from query to JSON
+bytes. The legacy path is what the list endpoints used to do: load Product
+objects, build ProductResponse.from_orm() per row, then let FastAPI
+validate the page against response_model again and encode it. The lean path
+is serialization.page_response() over rows of PRODUCT_COLUMNS.
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+import models
+import schemas
+import serialization
+
+
+def _setup(engine, rows: int):
+    models.Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [{"username": "seller", "email": "seller@bench", "hashed_password": "x", "role": "seller"}])
+        conn.execute(insert(models.Product), [
+            {
+                "title": f"Product {i}", "description": "A reasonably long description " * 4, "category": "Bench",
+                "images": ["/static/images/" + "ab" * 32 + ".jpg"], "listing_type": "auction" if i % 2 else "direct",
+                "status": "active", "price": None if i % 2 else 10.0 + i, "current_highest_bid": float(i),
+                "min_bid_increment": 1.0, "seller_id": 1, "end_time": now + timedelta(days=1), "created_at": now,
+            }
+            for i in range(rows)
+        ])
+
+
+def legacy(db) -> bytes:
+    products = db.query(models.Product).all()
+    results = [schemas.ProductResponse.from_orm(p) for p in products]
+    # What FastAPI does with the returned dict: validate against response_model, dump, encode
+    page = TypeAdapter(schemas.Page[schemas.ProductResponse]).validate_python(
+        {"items": results, "next_cursor": None}, from_attributes=True)
+    return json.dumps(page.model_dump(mode="json")).encode()
+
+
+def lean(db) -> bytes:
+    rows = db.query(*serialization.PRODUCT_COLUMNS).all()
+    return serialization.page_response(schemas.ProductResponse, rows, None).body
+
+
+def _time(Session, fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        db = Session()
+        start = time.perf_counter()
+        fn(db)
+        samples.append(time.perf_counter() - start)
+        db.close()
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>7} {'legacy ms':>10} {'lean ms':>9} {'speedup':>8}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+            _setup(engine, rows)
+            Session = sessionmaker(bind=engine)
+            db = Session()
+            # Same JSON either way, or the comparison means nothing
+            assert json.loads(legacy(db)) == json.loads(lean(db))
+            db.close()
+            legacy_ms = _time(Session, legacy, args.repeat)
+            lean_ms = _time(Session, lean, args.repeat)
+            engine.dispose()
+        print(f"{rows:>7} {legacy_ms:>10.1f} {lean_ms:>9.1f} {legacy_ms / lean_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
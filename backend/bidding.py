@@ -0,0 +1,147 @@
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+import dashboard
+import models
+
+COMMISSION_RATE = 0.05 # Default 5%
+
+
+class TopBid(NamedTuple):
+    user_id: int
+    amount: float
+    username: str
+
+
+def place_bid(db: Session, product_id: int, user_id: int, amount: float) -> models.Bid:
+    """Accepts a bid if it beats the current high bid by at least the increment.
+
+    The check and the write are one conditional UPDATE, so two concurrent
+    bidders can never both pass the check against the same old price: the
+    database applies the updates one after the other and the second one
+    re-evaluates the WHERE clause against the first one's amount. No row is
+    read or locked up front; the row is only locked from the UPDATE to the
+    commit a moment later.
+    """
+    now = datetime.utcnow()
+    accepted = db.query(models.Product).filter(
+        models.Product.id == product_id,
+        models.Product.listing_type == 'auction',
+        models.Product.status == 'active',
+        or_(models.Product.end_time.is_(None), models.Product.end_time >= now),
+        models.Product.current_highest_bid + models.Product.min_bid_increment <= amount,
+    ).update({models.Product.current_highest_bid: amount}, synchronize_session=False)
+
+    if not accepted:
+        db.rollback()
+        _reject(db, product_id, amount, now)
+
+    # Read while the product row is locked, so concurrent bids see each other's lead in order
+    leading = db.query(models.Bid.user_id, models.Bid.amount).filter(models.Bid.product_id == product_id) \
+        .order_by(models.Bid.amount.desc(), models.Bid.id).first()
+    # A tie (no increment) leaves the lead with the earlier bid, as in top_bids
+    dashboard.record_bid(db, product_id, user_id, leading.user_id if leading else None,
+                         takes_lead=leading is None or amount > leading.amount)
+    new_bid = models.Bid(product_id=product_id, user_id=user_id, amount=amount, timestamp=now)
+    db.add(new_bid)
+    db.commit()
+    # Load it now, while we are still off the event loop
+    db.refresh(new_bid)
+    return new_bid
+
+
+def _reject(db: Session, product_id: int, amount: float, now: datetime):
+    # Slow path: work out why the conditional update matched nothing
+    product = db.query(models.Product).filter(models.Product.id == product_id).first()
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    if product.listing_type != 'auction':
+        raise HTTPException(status_code=400, detail="This is not an auction")
+    if product.status != 'active':
+        raise HTTPException(status_code=400, detail="Auction is not active")
+    if product.end_time and now > product.end_time:
+        # The auction scheduler settles it (winner, transaction) at its deadline
+        raise HTTPException(status_code=400, detail="Auction has ended")
+    min_required = product.current_highest_bid + product.min_bid_increment
+    raise HTTPException(status_code=400, detail=f"Bid must be at least {min_required}")
+
+
+def top_bids(db: Session, product_ids: List[int]) -> Dict[int, TopBid]:
+    """Highest bid and bidder for each product, in one query."""
+    if not product_ids:
+        return {}
+    # Rank each product's bids and keep the top one
+    ranked = db.query(
+        models.Bid.product_id,
+        models.Bid.user_id,
+        models.Bid.amount,
+        func.row_number().over(
+            partition_by=models.Bid.product_id,
+            order_by=(models.Bid.amount.desc(), models.Bid.id),
+        ).label("rank"),
+    ).filter(models.Bid.product_id.in_(product_ids)).subquery()
+    rows = db.query(ranked.c.product_id, ranked.c.user_id, ranked.c.amount, models.User.username) \
+        .join(models.User, models.User.id == ranked.c.user_id) \
+        .filter(ranked.c.rank == 1) \
+        .all()
+    return {product_id: TopBid(user_id, amount, username) for product_id, user_id, amount, username in rows}
+
+
+def settle_auction(db: Session, product_id: int, seller_id: int, winner: Optional[TopBid]) -> Optional[dict]:
+    """Closes an active auction and records the sale to the highest bidder. The caller commits.
+
+    The status change is a conditional update, so when two workers race to
+    close the same auction only one of them creates the Transaction. Returns
+    the auction_closed event, or None if the auction was no longer active.
+    """
+    claimed = db.query(models.Product).filter(
+        models.Product.id == product_id,
+        models.Product.status == 'active',
+    ).update({models.Product.status: 'sold' if winner else 'ended'}, synchronize_session=False)
+    if not claimed:
+        return None
+
+    event = {"type": "auction_closed", "product_id": product_id, "status": 'sold' if winner else 'ended'}
+    dashboard.record_auction_closed(db, product_id, winner.user_id if winner else None)
+    if winner:
+        commission_amount = winner.amount * COMMISSION_RATE
+        transaction = models.Transaction(
+            product_id=product_id,
+            buyer_id=winner.user_id,
+            seller_id=seller_id,
+            total_amount=winner.amount,
+            commission_rate=COMMISSION_RATE,
+            commission_amount=commission_amount,
+            net_seller_amount=winner.amount - commission_amount,
+            status="pending" # Winner needs to pay? Or assume auto-charge?
+        )
+        db.add(transaction)
+        dashboard.record_sale(db, transaction)
+        event.update(winner_id=winner.user_id, winner_username=winner.username, amount=winner.amount)
+    return event
+
+
+def close_expired_auctions(db: Session, product_ids: List[int], now: datetime) -> List[dict]:
+    """Settles the given auctions that are past their end_time; returns their auction_closed events."""
+    query = db.query(models.Product.id, models.Product.seller_id).filter(
+        models.Product.id.in_(product_ids),
+        models.Product.listing_type == 'auction',
+        models.Product.status == 'active',
+        models.Product.end_time <= now,
+    )
+    if db.bind.dialect.name == "postgresql":
+        # Rows another worker is already closing are skipped, not waited on
+        query = query.with_for_update(skip_locked=True)
+    due = query.all()
+    winners = top_bids(db, [product_id for product_id, _ in due])
+    events = []
+    for product_id, seller_id in due:
+        event = settle_auction(db, product_id, seller_id, winners.get(product_id))
+        if event:
+            events.append(event)
+    db.commit()
+    return events
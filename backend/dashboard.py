@@ -0,0 +1,225 @@
+"""Dashboard totals, maintained incrementally so summaries are primary-key reads.
+
+Every write that changes a total (a purchase, a bid, an auction closing)
+calls into this module inside its own transaction, so the aggregates commit
+or roll back with it. If they ever drift, or rows were bulk-loaded around
+the API, rebuild them from the source tables. Run from backend/:
+
+    python dashboard.py --rebuild
+"""
+import argparse
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, literal, literal_column, select
+from sqlalchemy.orm import Session
+
+import database
+import models
+
+ALL_TIME = "all"
+
+
+def month_of(when: datetime) -> str:
+    return when.strftime("%Y-%m")
+
+
+def _increment(db: Session, model, keys: dict, deltas: dict):
+    """Adds `deltas` to the row at `keys`, creating it if needed, in one statement."""
+    stmt = database.upsert(db, model).values(**keys, **deltas)
+    table = model.__table__
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={name: table.c[name] + stmt.excluded[name] for name in deltas},
+    ))
+
+
+# --- Incremental updates; the caller commits ---
+
+def record_sale(db: Session, transaction: models.Transaction):
+    """A new Transaction: adds it to the seller's all-time and monthly totals and the buyer's orders."""
+    record_sales(db, [transaction])
+
+
+def record_sales(db: Session, transactions: Iterable[models.Transaction]):
+    """record_sale for several transactions, summed per row.
+
+    Rows are updated buyer_stats first, then seller_stats, each in key order,
+    so two checkouts with crossed sellers lock them in the same order.
+    """
+    buyers: Dict[int, Dict[str, float]] = {}
+    sellers: Dict[Tuple[int, str], Dict[str, float]] = {}
+    for transaction in transactions:
+        when = transaction.created_at or datetime.utcnow()
+        buyer = buyers.setdefault(transaction.buyer_id, {"orders_count": 0, "total_spent": 0.0})
+        buyer["orders_count"] += 1
+        buyer["total_spent"] += transaction.total_amount
+        for period in (ALL_TIME, month_of(when)):
+            seller = sellers.setdefault((transaction.seller_id, period), {
+                "sales_count": 0, "gross_amount": 0.0, "commission_amount": 0.0, "net_amount": 0.0,
+            })
+            seller["sales_count"] += 1
+            seller["gross_amount"] += transaction.total_amount
+            seller["commission_amount"] += transaction.commission_amount
+            seller["net_amount"] += transaction.net_seller_amount
+    for user_id, deltas in sorted(buyers.items()):
+        _increment(db, models.BuyerStats, {"user_id": user_id}, deltas)
+    for (seller_id, period), deltas in sorted(sellers.items()):
+        _increment(db, models.SellerStats, {"seller_id": seller_id, "period": period}, deltas)
+
+
+def record_bid(db: Session, product_id: int, user_id: int, previous_leader: Optional[int], takes_lead: bool = True):
+    """An accepted bid: the bidder may join the auction and takes the lead from `previous_leader`.
+
+    A bid that only ties the high bid (possible with no increment) leaves the lead
+    with the earlier bid: pass takes_lead=False.
+    """
+    record_bids(db, [(product_id, user_id, previous_leader, takes_lead)])
+
+
+def record_bids(db: Session, bids: Iterable[Tuple[int, int, Optional[int], bool]]):
+    """record_bid for many accepted bids (product, bidder, previous leader, takes lead) in order, netted per user."""
+    deltas: Dict[int, Dict[str, int]] = {}
+
+    def add(user_id: int, name: str, delta: int):
+        user = deltas.setdefault(user_id, {"active_bids": 0, "winning_bids": 0})
+        user[name] += delta
+
+    pairs = set()
+    for product_id, user_id, previous_leader, takes_lead in bids:
+        if (product_id, user_id) not in pairs:
+            pairs.add((product_id, user_id))
+            joined = db.execute(database.upsert(db, models.AuctionBidder).values(
+                product_id=product_id, user_id=user_id).on_conflict_do_nothing()).rowcount
+            if joined:
+                add(user_id, "active_bids", 1)
+        if takes_lead and previous_leader != user_id:
+            add(user_id, "winning_bids", 1)
+            if previous_leader is not None:
+                add(previous_leader, "winning_bids", -1)
+    for user_id, user in sorted(deltas.items()):
+        changed = {name: delta for name, delta in user.items() if delta}
+        if changed:
+            _increment(db, models.BuyerStats, {"user_id": user_id}, changed)
+
+
+def record_auction_closed(db: Session, product_id: int, winner_id: Optional[int]):
+    """The auction no longer counts as an active bid for anyone who bid on it."""
+    bidders = select(models.AuctionBidder.user_id).where(models.AuctionBidder.product_id == product_id)
+    if db.bind.dialect.name == "postgresql":
+        # The bulk UPDATE locks rows in scan order; take them in user id order first, like record_bids
+        db.query(models.BuyerStats.user_id).filter(models.BuyerStats.user_id.in_(bidders)) \
+            .order_by(models.BuyerStats.user_id).with_for_update().all()
+    db.query(models.BuyerStats).filter(models.BuyerStats.user_id.in_(bidders)).update(
+        {models.BuyerStats.active_bids: models.BuyerStats.active_bids - 1}, synchronize_session=False)
+    if winner_id is not None:
+        _increment(db, models.BuyerStats, {"user_id": winner_id}, {"winning_bids": -1})
+    db.execute(delete(models.AuctionBidder).where(models.AuctionBidder.product_id == product_id))
+
+
+# --- Reads ---
+
+def summary(db: Session, user_id: int, now: datetime) -> dict:
+    """The user's buyer totals, plus all-time and this month's sales totals."""
+    buyer = db.get(models.BuyerStats, user_id)
+    sales = {row.period: row for row in db.query(models.SellerStats).filter(
+        models.SellerStats.seller_id == user_id,
+        models.SellerStats.period.in_((ALL_TIME, month_of(now))),
+    )}
+
+    def totals(row: Optional[models.SellerStats]) -> dict:
+        if row is None:
+            return {"sales_count": 0, "gross_amount": 0.0, "commission_amount": 0.0, "net_amount": 0.0}
+        return {"sales_count": row.sales_count, "gross_amount": row.gross_amount,
+                "commission_amount": row.commission_amount, "net_amount": row.net_amount}
+
+    return {
+        "active_bids": buyer.active_bids if buyer else 0,
+        "winning_bids": buyer.winning_bids if buyer else 0,
+        "orders_count": buyer.orders_count if buyer else 0,
+        "total_spent": buyer.total_spent if buyer else 0.0,
+        "sales": totals(sales.get(ALL_TIME)),
+        "sales_this_month": totals(sales.get(month_of(now))),
+    }
+
+
+# --- Rebuild ---
+
+def _month_column(db: Session, column):
+    # Inline format, so the SELECT and GROUP BY expressions are identical to Postgres
+    if db.bind.dialect.name == "postgresql":
+        return func.to_char(column, literal_column("'YYYY-MM'"))
+    return func.strftime(literal_column("'%Y-%m'"), column)
+
+
+def rebuild(db: Session) -> Dict[str, int]:
+    """Recomputes every aggregate from products, bids and transactions. The caller commits.
+
+    On Postgres, run it while writes are paused (or accept that sales and
+    bids landing mid-rebuild may be counted twice or not at all, until the
+    next rebuild).
+    """
+    T = models.Transaction
+    for model in (models.SellerStats, models.BuyerStats, models.AuctionBidder):
+        db.execute(delete(model))
+
+    columns = ["seller_id", "period", "sales_count", "gross_amount", "commission_amount", "net_amount"]
+    sums = [func.count(), func.sum(T.total_amount), func.sum(T.commission_amount), func.sum(T.net_seller_amount)]
+    month = _month_column(db, T.created_at)
+    db.execute(insert(models.SellerStats).from_select(
+        columns, select(T.seller_id, literal(ALL_TIME), *sums).group_by(T.seller_id)))
+    db.execute(insert(models.SellerStats).from_select(
+        columns, select(T.seller_id, month, *sums).group_by(T.seller_id, month)))
+
+    active = select(models.Product.id).where(
+        models.Product.status == 'active', models.Product.listing_type == 'auction')
+    db.execute(insert(models.AuctionBidder).from_select(
+        ["product_id", "user_id"],
+        select(models.Bid.product_id, models.Bid.user_id).where(models.Bid.product_id.in_(active)).distinct()))
+
+    buyers: Dict[int, dict] = {}
+
+    def buyer(user_id: int) -> dict:
+        return buyers.setdefault(user_id, {"user_id": user_id, "active_bids": 0, "winning_bids": 0,
+                                           "orders_count": 0, "total_spent": 0.0})
+
+    for user_id, count in db.query(models.AuctionBidder.user_id, func.count()).group_by(models.AuctionBidder.user_id):
+        buyer(user_id)["active_bids"] = count
+    # Same ranking as bidding.top_bids: highest amount, earliest bid first
+    ranked = select(
+        models.Bid.user_id,
+        func.row_number().over(partition_by=models.Bid.product_id,
+                               order_by=(models.Bid.amount.desc(), models.Bid.id)).label("rank"),
+    ).where(models.Bid.product_id.in_(active)).subquery()
+    for user_id, count in db.query(ranked.c.user_id, func.count()).filter(ranked.c.rank == 1).group_by(ranked.c.user_id):
+        buyer(user_id)["winning_bids"] = count
+    for user_id, count, spent in db.query(T.buyer_id, func.count(), func.sum(T.total_amount)).group_by(T.buyer_id):
+        buyer(user_id).update(orders_count=count, total_spent=spent or 0.0)
+    if buyers:
+        db.execute(insert(models.BuyerStats), list(buyers.values()))
+
+    return {
+        "seller_rows": db.query(func.count()).select_from(models.SellerStats).scalar(),
+        "buyer_rows": len(buyers),
+        "auction_bidders": db.query(func.count()).select_from(models.AuctionBidder).scalar(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rebuild", action="store_true", help="Recompute all aggregates from the source tables")
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.error("nothing to do; pass --rebuild")
+
+    db = database.SessionLocal()
+    try:
+        counts = rebuild(db)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Rebuilt dashboard aggregates: {counts}")
+
+
+if __name__ == "__main__":
+    main()
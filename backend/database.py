@@ -1,8 +1,12 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 
 import os
+import threading
+import time
 
 # DO NOT CHANGE THIS TO POSTGRESQL LOCALLY unless you have it installed.
 # This defaults to SQLite so your local app keeps working.
@@ -12,13 +16,112 @@ SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./marketplace.db"
 if SQLALCHEMY_DATABASE_URL and SQLALCHEMY_DATABASE_URL.startswith("postgres://"):
     SQLALCHEMY_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-if "sqlite" in SQLALCHEMY_DATABASE_URL:
-    engine = create_engine(
-        SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+# Pool settings (all overridable from the environment)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Recycle before Render/managed Postgres drops idle connections
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+# SQLite tuning: WAL lets readers run alongside the writer, busy_timeout makes
+# writers wait for the lock instead of failing with "database is locked".
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+
+
+class PoolStats:
+    """Checkout wait times, for spotting pool exhaustion."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False):
+        with self.lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - start)
+        return connection
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+    cursor.close()
+
+
+def create_db_engine(url: str = SQLALCHEMY_DATABASE_URL, sqlite_tuning: bool = True):
+    pool_args = dict(
+        poolclass=InstrumentedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
     )
-else:
+    if "sqlite" in url:
+        new_engine = create_engine(url, connect_args={"check_same_thread": False}, **pool_args)
+        if sqlite_tuning:
+            event.listen(new_engine, "connect", _apply_sqlite_pragmas)
+        return new_engine
     # PostgreSQL configuration
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    return create_engine(url, pool_recycle=DB_POOL_RECYCLE, pool_pre_ping=DB_POOL_PRE_PING, **pool_args)
+
+
+def pool_status(target_engine=None) -> dict:
+    pool = (target_engine or engine).pool
+    stats = pool.stats
+    with stats.lock:
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": DB_MAX_OVERFLOW,
+            "checkouts": stats.checkouts,
+            "timeouts": stats.timeouts,
+            "wait_avg_ms": round(stats.wait_total / stats.checkouts * 1000, 3) if stats.checkouts else 0.0,
+            "wait_max_ms": round(stats.wait_max * 1000, 3),
+        }
+
+
+def upsert(db, model):
+    """An INSERT with on_conflict_do_nothing/on_conflict_do_update; both supported databases have ON CONFLICT."""
+    dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    return dialect.insert(model.__table__)
+
+
+engine = create_db_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
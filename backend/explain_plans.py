@@ -0,0 +1,86 @@
+"""Prints the query plan of every SQL statement issued by the read endpoints.
+
+Run from backend/ against the database in DATABASE_URL (seed it first so
+the planner has rows to work with):
+
+    python explain_plans.py
+
+Each endpoint is called directly with a real session; the statements it
+executes are captured and re-run under EXPLAIN QUERY PLAN (SQLite) or
+EXPLAIN (Postgres), so the plans are for exactly the SQL the API sends.
+"""
+from sqlalchemy import event, func
+
+import database
+import main as api
+import models
+import pagination
+
+
+def _explain(statement, parameters):
+    prefix = "EXPLAIN QUERY PLAN " if database.engine.dialect.name == "sqlite" else "EXPLAIN "
+    raw = database.engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute(prefix + statement, parameters)
+        rows = cursor.fetchall()
+    finally:
+        raw.close()
+    if database.engine.dialect.name == "sqlite":
+        # (id, parent, notused, detail)
+        return [row[3] for row in rows]
+    return [row[0] for row in rows]
+
+
+def _run(name, call):
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    event.listen(database.engine, "before_cursor_execute", capture)
+    try:
+        call()
+    finally:
+        event.remove(database.engine, "before_cursor_execute", capture)
+
+    print("=" * 78)
+    print(f"{name}  ({len(captured)} statements)")
+    for statement, parameters in captured:
+        print("-" * 78)
+        print(" ".join(statement.split()))
+        for line in _explain(statement, parameters):
+            print(f"    {line}")
+
+
+def main():
+    db = database.SessionLocal()
+    page = dict(cursor=None, limit=pagination.DEFAULT_PAGE_SIZE)
+    filters = dict(category=None, listing_type=None, min_price=None, max_price=None, search=None, sort=None)
+
+    product = db.query(models.Product).filter(models.Product.listing_type == 'auction') \
+        .outerjoin(models.Bid).group_by(models.Product.id) \
+        .order_by(func.count(models.Bid.id).desc()).first()
+    buyer = db.query(models.User).join(models.Bid, models.Bid.user_id == models.User.id).first()
+    seller = db.query(models.User).join(models.Product, models.Product.seller_id == models.User.id).first()
+    category = product.category if product else None
+
+    _run("GET /products", lambda: api.get_products(**filters, **page, db=db))
+    _run("GET /products?category=&listing_type=auction", lambda: api.get_products(
+        **{**filters, "category": category, "listing_type": "auction"}, **page, db=db))
+    _run("GET /products?sort=price_asc", lambda: api.get_products(**{**filters, "sort": "price_asc"}, **page, db=db))
+    _run("GET /products?sort=ending_soon", lambda: api.get_products(**{**filters, "sort": "ending_soon"}, **page, db=db))
+    _run("GET /products?search=gold", lambda: api.get_products(**{**filters, "search": "gold"}, **page, db=db))
+    if product:
+        _run("GET /products/{id}", lambda: api.get_product(product.id, db=db))
+        _run("GET /products/{id}/bids", lambda: api.get_product_bids(product.id, **page, db=db))
+    if seller:
+        _run("GET /users/me/products", lambda: api.get_my_products(sort="newest", **page, db=db, current_user=seller))
+    if buyer:
+        _run("GET /users/me/bids", lambda: api.get_my_bids(**page, db=db, current_user=buyer))
+        _run("GET /users/me/orders", lambda: api.get_my_orders(**page, db=db, current_user=buyer))
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
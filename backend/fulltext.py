@@ -0,0 +1,157 @@
+import html
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, literal_column, select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+import models
+
+logger = logging.getLogger(__name__)
+
+# Set by setup(): "sqlite" (FTS5), "postgresql" (tsvector + GIN) or None (LIKE fallback)
+backend: Optional[str] = None
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+
+# --- SQLite: FTS5 external-content table kept in sync by triggers ---
+
+_SQLITE_SETUP = [
+    """CREATE VIRTUAL TABLE products_fts USING fts5(
+        title, description,
+        content='products', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    # Only text edits touch the index; bid updates to current_highest_bid do not
+    """CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF title, description ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO products_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    # Index whatever rows existed before the table was created
+    "INSERT INTO products_fts(products_fts) VALUES ('rebuild')",
+]
+
+# --- Postgres: weighted tsvector expression with a GIN index on it ---
+# Queries must use exactly this expression for the planner to pick the index.
+
+_PG_VECTOR = (
+    "(setweight(to_tsvector('english', coalesce(products.title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(products.description, '')), 'B'))"
+)
+
+# Not in models.py; migrations/env.py keeps autogenerate from dropping it
+PG_SEARCH_INDEX = "ix_products_search"
+
+_PG_SETUP = [
+    f"CREATE INDEX IF NOT EXISTS {PG_SEARCH_INDEX} ON products USING GIN ({_PG_VECTOR})",
+]
+
+
+def setup(engine):
+    """Creates the search index for the engine's dialect. Safe to call on every startup."""
+    global backend
+    dialect = engine.dialect.name
+    try:
+        with engine.begin() as conn:
+            if dialect == "sqlite":
+                exists = conn.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'products_fts'"
+                )).first()
+                if not exists:
+                    for statement in _SQLITE_SETUP:
+                        conn.execute(text(statement))
+            elif dialect == "postgresql":
+                for statement in _PG_SETUP:
+                    conn.execute(text(statement))
+            else:
+                backend = None
+                return
+        backend = dialect
+    except OperationalError:
+        # e.g. SQLite built without FTS5
+        logger.warning("Full-text search unavailable, falling back to LIKE", exc_info=True)
+        backend = None
+
+
+def _terms(search: str) -> List[str]:
+    return re.findall(r"\w+", search.lower())
+
+
+def matches(search: str):
+    """Subquery of (id, rank) for products matching every search term.
+
+    Each term is prefix-matched, so "mug" finds "Mughal". Lower rank is more
+    relevant on every backend. Returns None when there is nothing to search for.
+    """
+    terms = _terms(search)
+    if not terms:
+        return None
+    if backend == "sqlite":
+        query = " ".join(f'"{t}"*' for t in terms)
+        return select(
+            literal_column("products_fts.rowid").label("id"),
+            # bm25 is negative, more negative is better; title hits weigh more
+            literal_column("bm25(products_fts, 10.0, 1.0)").label("rank"),
+        ).select_from(text("products_fts")).where(
+            text("products_fts MATCH :fts_query").bindparams(fts_query=query)
+        ).subquery("search_matches")
+    query = " & ".join(f"{t}:*" for t in terms)
+    tsquery = func.to_tsquery("english", bindparam("fts_query", query))
+    vector = literal_column(_PG_VECTOR)
+    return select(
+        models.Product.id.label("id"),
+        (-func.ts_rank(vector, tsquery)).label("rank"),
+    ).where(vector.op("@@")(tsquery)).subquery("search_matches")
+
+
+def like_filter(search: str):
+    # Used when no full-text index is available
+    return models.Product.title.contains(search) | models.Product.description.contains(search)
+
+
+def highlights(db: Session, search: str, product_ids: List[int]) -> Dict[int, Tuple[str, str]]:
+    """Highlighted title and description snippet for a page of search results."""
+    terms = _terms(search)
+    if not terms or not product_ids or backend is None:
+        return {}
+    if backend == "sqlite":
+        rows = db.execute(text(
+            "SELECT rowid, "
+            "highlight(products_fts, 0, :start, :end), "
+            "snippet(products_fts, 1, :start, :end, '…', 24) "
+            "FROM products_fts WHERE products_fts MATCH :fts_query AND rowid IN :ids"
+        ).bindparams(bindparam("ids", expanding=True)), {
+            "start": HIGHLIGHT_START,
+            "end": HIGHLIGHT_END,
+            "fts_query": " ".join(f'"{t}"*' for t in terms),
+            "ids": product_ids,
+        })
+    else:
+        options = f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxFragments=1, MaxWords=24, MinWords=8"
+        rows = db.execute(text(
+            "SELECT id, "
+            "ts_headline('english', coalesce(title, ''), to_tsquery('english', :fts_query), 'HighlightAll=true, ' || :options), "
+            "ts_headline('english', coalesce(description, ''), to_tsquery('english', :fts_query), :options) "
+            "FROM products WHERE id IN :ids"
+        ).bindparams(bindparam("ids", expanding=True)), {
+            "fts_query": " & ".join(f"{t}:*" for t in terms),
+            "options": options,
+            "ids": product_ids,
+        })
+    return {row[0]: (_escape(row[1]), _escape(row[2])) for row in rows}
+
+
+def _escape(marked: str) -> str:
+    # Product text is user supplied: escape it so only our <mark> tags are live HTML
+    return html.escape(marked) \
+        .replace(html.escape(HIGHLIGHT_START), HIGHLIGHT_START) \
+        .replace(html.escape(HIGHLIGHT_END), HIGHLIGHT_END)
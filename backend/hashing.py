@@ -0,0 +1,123 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+# bcrypt work factor. Hashes made with a different factor are rehashed on the next successful login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Worker processes for hashing; they run outside the GIL, off the request threadpool.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Hashes allowed in flight (running + queued) before new logins get a 503
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 8)))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+
+# --- Run inside the worker processes ---
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+# --- Pool and admission control, in the app process ---
+
+class HashStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "workers": PASSWORD_HASH_WORKERS,
+                "max_pending": PASSWORD_HASH_MAX_PENDING,
+                "in_flight": self.in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "latency_avg_ms": round(self.latency_total / self.completed * 1000, 1) if self.completed else 0.0,
+                "latency_max_ms": round(self.latency_max * 1000, 1),
+            }
+
+
+stats = HashStats()
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: forking a process that already runs threads and an event loop is unsafe
+            _executor = ProcessPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def shutdown(broken: Optional[ProcessPoolExecutor] = None):
+    """Stops the pool. With `broken`, only if that pool is still the current one."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None and (broken is None or _executor is broken):
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+async def _submit(fn, *args):
+    with stats.lock:
+        if stats.in_flight >= PASSWORD_HASH_MAX_PENDING:
+            stats.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Too many sign-ins in progress, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        stats.in_flight += 1
+    start = time.perf_counter()
+    executor = _get_executor()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM-killed); start a fresh pool for the next request,
+        # unless another request already has, and its hashes are running on it
+        shutdown(executor)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        with stats.lock:
+            stats.in_flight -= 1
+            stats.completed += 1
+            stats.latency_total += elapsed
+            stats.latency_max = max(stats.latency_max, elapsed)
+
+
+async def hash_password(password: str) -> str:
+    return await _submit(_hash, password)
+
+
+async def verify_password(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Returns (valid, new_hash); new_hash is set when the stored hash uses an outdated work factor."""
+    return await _submit(_verify_and_update, password, hashed_password)
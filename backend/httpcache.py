@@ -0,0 +1,119 @@
+import hashlib
+import os
+import re
+import threading
+from typing import NamedTuple, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from cache import TTLCache
+
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "true").lower() == "true"
+# Bounds staleness across workers for changes that only bump this worker's versions
+HTTP_CACHE_TTL = float(os.getenv("HTTP_CACHE_TTL", "10"))
+HTTP_CACHE_SIZE = int(os.getenv("HTTP_CACHE_SIZE", "512"))
+
+# Cacheable catalogue reads. A product id in the path scopes the entry to that product.
+CACHEABLE_PATHS = re.compile(r"^/products(?:/(\d+)(?:/bids)?)?$")
+
+
+class CachedResponse(NamedTuple):
+    version: Tuple[int, int]
+    body: bytes
+    etag: str
+    media_type: str
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]
+
+
+class ResponseCache:
+    """Caches serialized GET /products, /products/{id} and /products/{id}/bids responses.
+
+    Entries are keyed by path and query string and remember the version they
+    were built at: the catalogue version for listings, the product's own
+    version for a single product and its bids. invalidate() bumps them, which
+    retires every affected entry at once without having to find it.
+
+    Product versions are kept in a bounded LRU. A product's version is the
+    catalogue version at its last invalidation, and one that was evicted comes
+    back as the current catalogue version. That is never lower than the value
+    it lost, so an entry built before an invalidation can't match again.
+
+    Every response carries an ETag (a hash of the body, so it agrees across
+    workers) and a conditional request with a matching If-None-Match gets
+    304 Not Modified, whether or not the body came from the cache.
+    """
+
+    def __init__(self, maxsize: int = HTTP_CACHE_SIZE, ttl: float = HTTP_CACHE_TTL):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.lock = threading.Lock()
+        self.catalog_version = 0
+        self.product_versions = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def version(self, product_id: Optional[int]) -> Tuple[int, int]:
+        with self.lock:
+            if product_id is None:
+                return self.catalog_version, 0
+            version = self.product_versions.get(product_id)
+            if version is None:
+                version = self.catalog_version
+                self.product_versions.set(product_id, version)
+            return 0, version
+
+    def invalidate(self, product_id: Optional[int] = None):
+        """Marks cached listings, and the given product's pages, as stale."""
+        with self.lock:
+            self.catalog_version += 1
+            if product_id is not None:
+                self.product_versions.set(product_id, self.catalog_version)
+
+    def _respond(self, request: Request, entry: CachedResponse, cache_status: str) -> Response:
+        headers = {"ETag": entry.etag, "Cache-Control": "no-cache", "X-Cache": cache_status}
+        if _not_modified(request, entry.etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type=entry.media_type, headers=headers)
+
+    async def serve(self, request: Request, call_next) -> Response:
+        match = CACHEABLE_PATHS.match(request.url.path) if request.method == "GET" else None
+        if not HTTP_CACHE_ENABLED or match is None:
+            return await call_next(request)
+
+        product_id = int(match.group(1)) if match.group(1) else None
+        key = (request.url.path, str(request.query_params))
+        # Taken before the handler runs: a write landing meanwhile leaves this entry already stale
+        version = self.version(product_id)
+        entry = self.entries.get(key)
+        if entry is not None and entry.version == version:
+            self.hits += 1
+            return self._respond(request, entry, "HIT")
+
+        self.misses += 1
+        response = await call_next(request)
+        if response.status_code != 200:
+            return response
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        entry = CachedResponse(version, body, _etag(body), response.headers.get("content-type", "application/json"))
+        self.entries.set(key, entry)
+        return self._respond(request, entry, "MISS")
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+        }
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+import database
+import models
+from cache import TTLCache
+
+# How long a key is remembered; clients must not reuse one within this window
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", str(24 * 3600)))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+# A claim this old whose request never finished (worker died) may be taken over
+IDEMPOTENCY_CLAIM_TIMEOUT = int(os.getenv("IDEMPOTENCY_CLAIM_TIMEOUT", "60"))
+MAX_KEY_LENGTH = 255
+# Expired rows are deleted every this many new keys, per worker
+PURGE_EVERY = 1000
+
+
+class StoredResponse(NamedTuple):
+    fingerprint: str
+    status_code: int
+    body: str
+
+
+async def fingerprint(request: Request) -> str:
+    """What makes two requests "the same": method, path and body (already read and cached by FastAPI)."""
+    digest = hashlib.sha256(f"{request.method} {request.url.path}\n".encode())
+    digest.update(await request.body())
+    return digest.hexdigest()
+
+
+class IdempotencyStore:
+    """Replays the outcome of a write sent again with the same Idempotency-Key.
+
+    Finished outcomes are kept in a per-worker LRU in front of the
+    idempotency_keys table, which all workers share. The first request
+    claims its key with an INSERT before doing any work, so a retry that
+    arrives while it is still running gets a 409 instead of a second write.
+    Deterministic failures (4xx) are stored and replayed too; anything else
+    releases the key so the client can retry for real.
+    """
+
+    def __init__(self):
+        self.responses = TTLCache(maxsize=IDEMPOTENCY_CACHE_SIZE, ttl=IDEMPOTENCY_TTL)
+        self.claims = 0
+
+    async def run(self, user_id: int, key: Optional[str], request: Request, handler: Callable[[], Awaitable[Any]]):
+        if key is None:
+            return await handler()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+
+        request_fingerprint = await fingerprint(request)
+        stored = self.responses.get((user_id, key))
+        if stored is None:
+            claimed, stored = await run_in_threadpool(self._claim, user_id, key, request_fingerprint)
+            if stored is None and not claimed:
+                raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress",
+                                    headers={"Retry-After": "1"})
+        if stored is not None:
+            return self._replay(user_id, key, stored, request_fingerprint)
+
+        try:
+            result = await handler()
+        except HTTPException as e:
+            if e.status_code >= 500:
+                await run_in_threadpool(self._release, user_id, key)
+                raise
+            await run_in_threadpool(self._finish, user_id, key,
+                                    StoredResponse(request_fingerprint, e.status_code, json.dumps({"detail": e.detail})))
+            raise
+        except BaseException:
+            await run_in_threadpool(self._release, user_id, key)
+            raise
+        await run_in_threadpool(self._finish, user_id, key,
+                                StoredResponse(request_fingerprint, 200, json.dumps(jsonable_encoder(result))))
+        return result
+
+    def _replay(self, user_id: int, key: str, stored: StoredResponse, request_fingerprint: str) -> Response:
+        if stored.fingerprint != request_fingerprint:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+        self.responses.set((user_id, key), stored)
+        return Response(content=stored.body, status_code=stored.status_code, media_type="application/json",
+                        headers={"Idempotent-Replayed": "true"})
+
+    # --- Database side (threadpool) ---
+
+    def _claim(self, user_id: int, key: str, request_fingerprint: str) -> Tuple[bool, Optional[StoredResponse]]:
+        """(True, None) if this request now owns the key; otherwise the stored outcome, if finished."""
+        now = datetime.utcnow()
+        db = database.SessionLocal()
+        try:
+            self.claims += 1
+            if self.claims % PURGE_EVERY == 0:
+                db.query(models.IdempotencyKey).filter(
+                    models.IdempotencyKey.created_at < now - timedelta(seconds=IDEMPOTENCY_TTL)
+                ).delete(synchronize_session=False)
+
+            inserted = db.execute(database.upsert(db, models.IdempotencyKey).values(
+                user_id=user_id, key=key, fingerprint=request_fingerprint, created_at=now,
+            ).on_conflict_do_nothing()).rowcount
+            if inserted:
+                db.commit()
+                return True, None
+
+            row = db.get(models.IdempotencyKey, (user_id, key))
+            if row is None:
+                # Deleted between our INSERT and read; the client can simply retry
+                db.rollback()
+                return False, None
+            expired = row.created_at < now - timedelta(seconds=IDEMPOTENCY_TTL)
+            abandoned = row.status_code is None and row.created_at < now - timedelta(seconds=IDEMPOTENCY_CLAIM_TIMEOUT)
+            if expired or abandoned:
+                # Take it over, unless another retry just did
+                taken = db.query(models.IdempotencyKey).filter(
+                    models.IdempotencyKey.user_id == user_id,
+                    models.IdempotencyKey.key == key,
+                    models.IdempotencyKey.created_at == row.created_at,
+                ).update({
+                    models.IdempotencyKey.fingerprint: request_fingerprint,
+                    models.IdempotencyKey.status_code: None,
+                    models.IdempotencyKey.response_body: None,
+                    models.IdempotencyKey.created_at: now,
+                }, synchronize_session=False)
+                db.commit()
+                return bool(taken), None
+            # Copied out before the rollback, which would expire the row and reload it on access
+            stored = None if row.status_code is None else StoredResponse(row.fingerprint, row.status_code, row.response_body)
+            db.rollback()
+            return False, stored
+        finally:
+            db.close()
+
+    def _finish(self, user_id: int, key: str, stored: StoredResponse):
+        db = database.SessionLocal()
+        try:
+            db.query(models.IdempotencyKey).filter(
+                models.IdempotencyKey.user_id == user_id,
+                models.IdempotencyKey.key == key,
+            ).update({
+                models.IdempotencyKey.status_code: stored.status_code,
+                models.IdempotencyKey.response_body: stored.body,
+            }, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        self.responses.set((user_id, key), stored)
+
+    def _release(self, user_id: int, key: str):
+        db = database.SessionLocal()
+        try:
+            db.query(models.IdempotencyKey).filter(
+                models.IdempotencyKey.user_id == user_id,
+                models.IdempotencyKey.key == key,
+                models.IdempotencyKey.status_code.is_(None),
+            ).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
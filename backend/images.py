@@ -0,0 +1,189 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.staticfiles import StaticFiles
+from PIL import Image, ImageOps
+
+IMAGE_DIR = "static/images"
+IMAGE_URL_PREFIX = "/static/images/"
+# Uploads larger than this get a 413: up front from Content-Length, else while being copied
+IMAGE_UPLOAD_MAX_BYTES = int(os.getenv("IMAGE_UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+# Refuse decompression bombs: a small file that expands to a huge bitmap
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(40_000_000)))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+CHUNK_SIZE = 64 * 1024
+
+# Longest side in pixels of each WebP variant
+VARIANTS = {"thumb": 320, "medium": 800, "large": 1600}
+WEBP_QUALITY = 80
+
+# Magic bytes -> (Pillow format, extension). The client's filename and Content-Type are not trusted.
+SIGNATURES = [
+    (b"\xff\xd8\xff", "JPEG", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "PNG", "png"),
+    (b"GIF87a", "GIF", "gif"),
+    (b"GIF89a", "GIF", "gif"),
+]
+
+
+def sniff(head: bytes) -> Optional[tuple]:
+    for magic, image_format, extension in SIGNATURES:
+        if head.startswith(magic):
+            return image_format, extension
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "WEBP", "webp"
+    return None
+
+
+def variant_url(url: str, variant: str) -> Optional[str]:
+    """URL of a resized variant of an uploaded image; None for external or pre-pipeline images."""
+    if not url or not url.startswith(IMAGE_URL_PREFIX):
+        return None
+    name = url[len(IMAGE_URL_PREFIX):].rsplit(".", 1)[0]
+    # Content-addressed uploads are named by their sha256 digest
+    if len(name) != 64:
+        return None
+    return f"{IMAGE_URL_PREFIX}{name}_{variant}.webp"
+
+
+def _urls(digest: str, extension: str) -> Dict[str, str]:
+    urls = {"original": f"{IMAGE_URL_PREFIX}{digest}.{extension}"}
+    for variant in VARIANTS:
+        urls[variant] = f"{IMAGE_URL_PREFIX}{digest}_{variant}.webp"
+    return urls
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """Uploaded files never change under the same name, so browsers and CDNs may cache them for good."""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+
+# --- Run inside the worker processes ---
+
+def _process(tmp_path: str, digest: str, image_format: str, extension: str):
+    """Checks the image decodes as the sniffed format, then writes the original and its WebP variants."""
+    Image.MAX_IMAGE_PIXELS = IMAGE_MAX_PIXELS
+    with Image.open(tmp_path) as image:
+        if image.format != image_format:
+            raise ValueError(f"Expected {image_format}, got {image.format}")
+        if image.width * image.height > IMAGE_MAX_PIXELS:
+            raise ValueError("Image too large")
+        image.load()
+        # Apply the camera's EXIF rotation so thumbnails are upright
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+        for variant, size in VARIANTS.items():
+            resized = image.copy()
+            resized.thumbnail((size, size), Image.LANCZOS)
+            target = os.path.join(IMAGE_DIR, f"{digest}_{variant}.webp")
+            resized.save(target + ".part", "WEBP", quality=WEBP_QUALITY, method=4)
+            os.replace(target + ".part", target)
+    # The original goes last: its presence marks the upload as complete for dedupe
+    os.replace(tmp_path, os.path.join(IMAGE_DIR, f"{digest}.{extension}"))
+
+
+# --- Pool, in the app process ---
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn, for the same reason as the password hashing pool
+            _executor = ProcessPoolExecutor(
+                max_workers=IMAGE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def shutdown(broken: Optional[ProcessPoolExecutor] = None):
+    """Stops the pool. With `broken`, only if that pool is still the current one."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None and (broken is None or _executor is broken):
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def save_upload(file: UploadFile) -> Dict[str, str]:
+    """Streams an upload to disk under a size limit and returns the URL of each size.
+
+    Files are named by the sha256 of their bytes, so the same image uploaded
+    twice is stored and resized once.
+    """
+    if file.content_type and not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=415, detail="Only image uploads are allowed")
+
+    os.makedirs(IMAGE_DIR, exist_ok=True)
+    tmp_path = os.path.join(IMAGE_DIR, f".upload-{uuid.uuid4()}")
+    digest = hashlib.sha256()
+    size = 0
+    detected = None
+    out = await run_in_threadpool(open, tmp_path, "wb")
+    try:
+        while True:
+            chunk = await file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            if detected is None:
+                detected = sniff(chunk)
+                if detected is None:
+                    raise HTTPException(status_code=415, detail="Unsupported image type (use JPEG, PNG, GIF or WebP)")
+            size += len(chunk)
+            if size > IMAGE_UPLOAD_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"Image larger than {IMAGE_UPLOAD_MAX_BYTES // (1024 * 1024)} MB")
+            digest.update(chunk)
+            await run_in_threadpool(out.write, chunk)
+        await run_in_threadpool(out.close)
+        if detected is None:
+            raise HTTPException(status_code=400, detail="Empty upload")
+
+        image_format, extension = detected
+        digest = digest.hexdigest()
+        urls = _urls(digest, extension)
+        if os.path.exists(os.path.join(IMAGE_DIR, f"{digest}.{extension}")):
+            # Seen before: the variants already exist
+            await run_in_threadpool(_remove, tmp_path)
+            return urls
+
+        loop = asyncio.get_running_loop()
+        executor = _get_executor()
+        try:
+            await loop.run_in_executor(executor, _process, tmp_path, digest, image_format, extension)
+        except BrokenProcessPool:
+            # Not a pool another upload has already replaced
+            shutdown(executor)
+            raise HTTPException(status_code=503, detail="Image processing unavailable, please retry")
+        except Exception:
+            raise HTTPException(status_code=400, detail="File is not a valid image")
+        return urls
+    finally:
+        if not out.closed:
+            await run_in_threadpool(out.close)
+        if os.path.exists(tmp_path):
+            await run_in_threadpool(_remove, tmp_path)
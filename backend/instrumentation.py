@@ -0,0 +1,266 @@
+import contextvars
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import PlainTextResponse, Response
+from sqlalchemy import event
+from starlette.routing import Match
+
+logger = logging.getLogger("vortex.slow_queries")
+
+INSTRUMENTATION_ENABLED = os.getenv("INSTRUMENTATION_ENABLED", "false").lower() == "true"
+# Statements slower than this are logged with their SQL
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+# Allows ?profile=1 on any request; leave off in production
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "2"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+
+class RequestStats:
+    """Database work done on behalf of one request, from any thread it runs on."""
+
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+
+# The context is copied into the threadpool, so sync endpoints add to the same RequestStats
+current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("current_request", default=None)
+current_route: contextvars.ContextVar[str] = contextvars.ContextVar("current_route", default="background task")
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+
+class Metrics:
+    """Per-process request and query metrics, rendered in the Prometheus text format.
+
+    Each worker keeps its own numbers; with several workers, scrape each one
+    (or use the per-request headers) rather than expecting totals.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.query_counts: Dict[Tuple[str, str], Histogram] = {}
+        self.db_seconds: Dict[Tuple[str, str], float] = defaultdict(float)
+        self.requests: Counter = Counter()
+        self.query_latency = Histogram(LATENCY_BUCKETS)
+        self.slow_queries = 0
+        self.gauges: List[Tuple[str, str, Callable[[], float]]] = []
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float]):
+        """Adds a value read at scrape time, e.g. pool usage."""
+        self.gauges.append((name, help_text, read))
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        key = (method, route)
+        with self.lock:
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.query_counts.setdefault(key, Histogram(QUERY_COUNT_BUCKETS)).observe(stats.queries)
+            self.db_seconds[key] += stats.db_time
+            self.requests[(method, route, status)] += 1
+
+    def observe_query(self, seconds: float, slow: bool):
+        with self.lock:
+            self.query_latency.observe(seconds)
+            if slow:
+                self.slow_queries += 1
+
+    def _histogram(self, lines: List[str], name: str, histogram: Histogram, **labels):
+        base = _labels(**labels)
+        sep = "," if base else ""
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            lines.append(f'{name}_bucket{{{base}{sep}le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{{base}{sep}le="+Inf"}} {histogram.count}')
+        suffix = f"{{{base}}}" if base else ""
+        lines.append(f"{name}_sum{suffix} {histogram.total}")
+        lines.append(f"{name}_count{suffix} {histogram.count}")
+
+    def render(self) -> str:
+        lines = []
+        with self.lock:
+            lines += ["# HELP http_request_duration_seconds Request latency by route.",
+                      "# TYPE http_request_duration_seconds histogram"]
+            for (method, route), histogram in sorted(self.latency.items()):
+                self._histogram(lines, "http_request_duration_seconds", histogram, method=method, route=route)
+            lines += ["# HELP http_requests_total Requests by route and status.",
+                      "# TYPE http_requests_total counter"]
+            for (method, route, status), count in sorted(self.requests.items()):
+                lines.append(f"http_requests_total{{{_labels(method=method, route=route, status=status)}}} {count}")
+            lines += ["# HELP http_request_db_queries Database statements per request.",
+                      "# TYPE http_request_db_queries histogram"]
+            for (method, route), histogram in sorted(self.query_counts.items()):
+                self._histogram(lines, "http_request_db_queries", histogram, method=method, route=route)
+            lines += ["# HELP http_request_db_seconds_total Time spent in database statements by route.",
+                      "# TYPE http_request_db_seconds_total counter"]
+            for (method, route), seconds in sorted(self.db_seconds.items()):
+                lines.append(f"http_request_db_seconds_total{{{_labels(method=method, route=route)}}} {seconds}")
+            lines += ["# HELP db_query_duration_seconds Latency of individual database statements.",
+                      "# TYPE db_query_duration_seconds histogram"]
+            self._histogram(lines, "db_query_duration_seconds", self.query_latency)
+            lines += [f"# HELP db_slow_queries_total Statements slower than {SLOW_QUERY_MS} ms.",
+                      "# TYPE db_slow_queries_total counter",
+                      f"db_slow_queries_total {self.slow_queries}"]
+        for name, help_text, read in self.gauges:
+            try:
+                value = read()
+            except Exception:
+                continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+# --- SQLAlchemy hooks ---
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    slow = elapsed * 1000 >= SLOW_QUERY_MS
+    metrics.observe_query(elapsed, slow)
+    stats = current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += elapsed
+    if slow:
+        # One line per statement, so log search and aggregation work
+        logger.warning("Slow query (%.1f ms) during %s: %s", elapsed * 1000, current_route.get(), " ".join(statement.split()))
+
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# --- Profiler ---
+
+class Sampler(threading.Thread):
+    """Samples the stacks of every thread at a fixed interval while one request runs.
+
+    Only stacks passing through this app's code are kept, which leaves out
+    idle threads and the event loop waiting for I/O. Other requests running
+    at the same time show up too, so profile on a quiet instance.
+    """
+
+    def __init__(self, interval: float):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.done = threading.Event()
+        self.samples = 0
+        self.inclusive: Counter = Counter()
+        self.own: Counter = Counter()
+
+    def run(self):
+        me = threading.get_ident()
+        while not self.done.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_filename, frame.f_lineno if not stack else code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                if not any(f.startswith(BACKEND_DIR) and "site-packages" not in f for f, _, _ in stack):
+                    continue
+                self.samples += 1
+                self.own[stack[0]] += 1
+                for entry in set(stack):
+                    self.inclusive[entry] += 1
+
+    def report(self, top: int = 40) -> str:
+        interval_ms = self.interval * 1000
+
+        def where(filename):
+            if filename.startswith(BACKEND_DIR) and "site-packages" not in filename:
+                return os.path.relpath(filename, BACKEND_DIR)
+            return filename.rpartition("site-packages" + os.sep)[2]
+
+        def rows(counter):
+            out = []
+            for (filename, line, name), count in counter.most_common(top):
+                out.append(f"{count:>7} {count / self.samples:>6.1%}  {name}  ({where(filename)}:{line})")
+            return out
+
+        if not self.samples:
+            return "No samples: the request finished before the first one; try again or lower PROFILE_INTERVAL_MS.\n"
+        lines = [f"{self.samples} samples every {interval_ms:g} ms (~{self.samples * interval_ms:.0f} ms of work)", "",
+                 "Inclusive (time in the function and what it called):"] + rows(self.inclusive)
+        lines += ["", "Self (the frame that was running):"] + rows(self.own)
+        return "\n".join(lines) + "\n"
+
+
+# --- Middleware ---
+
+def _route_of(request: Request) -> str:
+    # The template, not the raw path, so /products/1 and /products/2 share a series
+    route = request.scope.get("route")
+    if route is None:
+        # Answered before routing (cache hit, early 413): find the route it would have hit
+        route = next((r for r in request.app.router.routes if r.matches(request.scope)[0] == Match.FULL), None)
+    return getattr(route, "path", None) or "unmatched"
+
+
+async def instrument(request: Request, call_next) -> Response:
+    profile = PROFILING_ENABLED and request.query_params.get("profile") == "1"
+    sampler = None
+    if profile:
+        sampler = Sampler(PROFILE_INTERVAL_MS / 1000)
+        sampler.start()
+
+    stats = RequestStats()
+    stats_token = current_request.set(stats)
+    route_token = current_route.set(f"{request.method} {request.url.path}")
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        elapsed = time.perf_counter() - started
+        current_request.reset(stats_token)
+        current_route.reset(route_token)
+        if sampler is not None:
+            sampler.done.set()
+            sampler.join()
+
+    metrics.observe_request(request.method, _route_of(request), response.status_code, elapsed, stats)
+    if sampler is not None:
+        return PlainTextResponse(sampler.report(), headers={"X-Profile-Samples": str(sampler.samples)})
+    # Shows up in the browser dev tools' timing tab
+    response.headers["Server-Timing"] = (
+        f'app;dur={elapsed * 1000:.1f}, db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"')
+    return response
@@ -0,0 +1,162 @@
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+import models
+import pagination
+import schemas
+from cache import TTLCache
+
+# Bids kept per auction; enough for the first page of the bid history
+LIVE_AUCTION_TOP_BIDS = int(os.getenv("LIVE_AUCTION_TOP_BIDS", str(pagination.DEFAULT_PAGE_SIZE)))
+LIVE_AUCTION_CACHE_SIZE = int(os.getenv("LIVE_AUCTION_CACHE_SIZE", "1000"))
+# Upper bound on staleness should an event ever be missed
+LIVE_AUCTION_CACHE_TTL = float(os.getenv("LIVE_AUCTION_CACHE_TTL", "300"))
+
+
+class CachedBid(NamedTuple):
+    id: int
+    product_id: int
+    user_id: int
+    username: str
+    amount: float
+    timestamp: datetime
+
+
+class AuctionState:
+    """Live state of one active auction: its product row plus the top bids by amount."""
+
+    def __init__(self, product: schemas.ProductResponse, min_bid_increment: float, top_bids: List[CachedBid], bid_count: int):
+        self.product = product
+        self.min_bid_increment = min_bid_increment
+        self.top_bids = top_bids
+        self.bid_count = bid_count
+
+    @property
+    def current_highest_bid(self) -> float:
+        return self.product.current_highest_bid
+
+
+class LiveAuctionCache:
+    """Per-worker cache of hot auctions, updated in place from bid events.
+
+    Every worker receives every bid through the event bus, so entries are kept
+    current without re-reading the database. The database stays the source of
+    truth: bids only ever raise the price, so the cached price is at worst
+    lower than the real one, and a bid below the cached minimum is certainly
+    too low. Accepting a bid still goes through bidding.place_bid().
+    """
+
+    def __init__(self, pending_bids: Optional[Callable[[int], list]] = None):
+        self.lock = threading.Lock()
+        # Accepted bids not yet in the bids table (write-behind), merged into loaded state
+        self.pending_bids = pending_bids
+        self.states = TTLCache(maxsize=LIVE_AUCTION_CACHE_SIZE, ttl=LIVE_AUCTION_CACHE_TTL)
+        # Events seen per product, so a load that raced with a bid isn't cached stale
+        self.event_counts = TTLCache(maxsize=LIVE_AUCTION_CACHE_SIZE * 4, ttl=LIVE_AUCTION_CACHE_TTL)
+
+    def get(self, product_id: int) -> Optional[AuctionState]:
+        return self.states.get(product_id)
+
+    def load(self, db: Session, product_id: int) -> Optional[AuctionState]:
+        """Cached state, reading it from the database on a miss. None if not an active auction."""
+        state = self.states.get(product_id)
+        if state is not None:
+            return state
+        events_before = self.event_counts.get(product_id)
+        # Before the table: a pending bid only disappears from here once it is committed
+        pending = self.pending_bids(product_id) if self.pending_bids else []
+
+        product = db.query(models.Product).filter(models.Product.id == product_id).first()
+        if not product or product.listing_type != 'auction' or product.status != 'active':
+            return None
+        rows = db.query(models.Bid, models.User.username) \
+            .join(models.User, models.User.id == models.Bid.user_id) \
+            .filter(models.Bid.product_id == product_id) \
+            .order_by(*pagination.BIDS_BY_AMOUNT.order_by()) \
+            .limit(LIVE_AUCTION_TOP_BIDS).all()
+        top_bids = [CachedBid(b.id, b.product_id, b.user_id, username, b.amount, b.timestamp) for b, username in rows]
+        bid_count = len(top_bids)
+        if bid_count == LIVE_AUCTION_TOP_BIDS:
+            bid_count = db.query(func.count(models.Bid.id)).filter(models.Bid.product_id == product_id).scalar()
+
+        stored = {b.id for b in top_bids}
+        pending = [b for b in pending if b.id not in stored]
+        if pending:
+            usernames = dict(db.query(models.User.id, models.User.username)
+                             .filter(models.User.id.in_({b.user_id for b in pending})))
+            top_bids = sorted(
+                top_bids + [CachedBid(b.id, b.product_id, b.user_id, usernames.get(b.user_id), b.amount, b.timestamp)
+                            for b in pending],
+                key=lambda b: (-b.amount, b.id),
+            )[:LIVE_AUCTION_TOP_BIDS]
+            bid_count += len(pending)
+
+        p_resp = schemas.ProductResponse.from_orm(product)
+        p_resp.highest_bidder_username = top_bids[0].username if top_bids else None
+        if top_bids:
+            p_resp.current_highest_bid = max(p_resp.current_highest_bid or 0.0, top_bids[0].amount)
+        state = AuctionState(p_resp, product.min_bid_increment, top_bids, bid_count)
+        with self.lock:
+            if self.event_counts.get(product_id) == events_before:
+                self.states.set(product_id, state)
+        return state
+
+    def apply_event(self, product_id: int, message: str):
+        """Updates the cache from a new_bid / auction_closed event on the bus."""
+        try:
+            event = json.loads(message)
+        except ValueError:
+            return
+        with self.lock:
+            self.event_counts.set(product_id, (self.event_counts.get(product_id) or 0) + 1)
+            if event.get("type") == "auction_closed":
+                self.states.delete(product_id)
+                return
+            if event.get("type") != "new_bid":
+                return
+            state = self.states.get(product_id)
+            if state is None or "bid_id" not in event:
+                return
+            if any(b.id == event["bid_id"] for b in state.top_bids):
+                return
+            bid = CachedBid(
+                event["bid_id"], product_id, event["user_id"], event["username"],
+                event["amount"], datetime.fromisoformat(event["timestamp"]),
+            )
+            # Events can arrive out of order across workers: insert by (amount desc, id asc)
+            top_bids = sorted(state.top_bids + [bid], key=lambda b: (-b.amount, b.id))[:LIVE_AUCTION_TOP_BIDS]
+            leader = top_bids[0]
+            # Replace, don't mutate, so readers holding the old objects see a consistent state
+            product = state.product.model_copy(update={
+                "current_highest_bid": max(state.current_highest_bid, leader.amount),
+                "highest_bidder_username": leader.username,
+            })
+            self.states.set(product_id, AuctionState(product, state.min_bid_increment, top_bids, state.bid_count + 1))
+
+    def precheck(self, product_id: int, amount: float, now: datetime):
+        """Rejects bids the cache already knows will fail, without touching the database."""
+        state = self.states.get(product_id)
+        if state is None:
+            return
+        if state.product.end_time and now > state.product.end_time:
+            raise HTTPException(status_code=400, detail="Auction has ended")
+        min_required = state.current_highest_bid + state.min_bid_increment
+        if amount < min_required:
+            raise HTTPException(status_code=400, detail=f"Bid must be at least {min_required}")
+
+    def bids_page(self, state: AuctionState, limit: int) -> Optional[dict]:
+        """First page of the bid history from the cache, or None if it holds too few bids."""
+        if limit > len(state.top_bids) and state.bid_count > len(state.top_bids):
+            return None
+        items = [schemas.BidResponse(**b._asdict()) for b in state.top_bids[:limit]]
+        next_cursor = None
+        if state.bid_count > limit:
+            next_cursor = pagination.encode_cursor(pagination.BIDS_BY_AMOUNT, state.top_bids[limit - 1])
+        return {"items": items, "next_cursor": next_cursor}
@@ -1,16 +1,17 @@
-from fastapi import FastAPI, Depends, HTTPException, status, WebSocket, WebSocketDisconnect, File, UploadFile
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, status, WebSocket, WebSocketDisconnect, File, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Dict, List, Optional
 from datetime import datetime, timedelta
-import models, schemas, database, auth
-import shutil
+import models, schemas, database, auth, realtime, pubsub, pagination, fulltext, migrate, bidding, hashing, scheduler, live_auctions, images, httpcache, serialization, instrumentation, dashboard, purchases, idempotency, write_behind
+import json
 import os
-import uuid
 
 # Init DB
-models.Base.metadata.create_all(bind=database.engine)
+migrate.upgrade()
+fulltext.setup(database.engine)
 
 import seed_data # Import the seed script
 
@@ -18,20 +19,7 @@ app = FastAPI(title="Marketplace API")
 
 # Mount Static Files
 os.makedirs("static/images", exist_ok=True)
-app.mount("/static", StaticFiles(directory="static"), name="static")
-
-# CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[
-        "http://localhost:5173",
-        "https://vortex-1-n5fc.onrender.com",
-        "https://vortex-frontend-4ij4.onrender.com"
-    ],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+app.mount("/static", images.ImmutableStaticFiles(directory="static"), name="static")
 
 @app.post("/seed")
 def run_seed_data():
@@ -41,15 +29,20 @@ def run_seed_data():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/db/stats")
+def db_pool_stats():
+    # Connection pool usage and checkout wait times, for monitoring
+    return database.pool_status()
+
 # --- Auth Endpoints ---
 
-@app.post("/auth/register", response_model=schemas.Token)
-def register(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    hashed_password = auth.get_password_hash(user.password)
+# register and login are async so bcrypt can be awaited on the hashing process pool
+# without holding a threadpool thread; their DB work still goes to the threadpool.
+
+def find_user_by_email(db: Session, email: str):
+    return db.query(models.User).filter(models.User.email == email).first()
+
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: str) -> schemas.UserResponse:
     new_user = models.User(
         username=user.username,
         email=user.email,
@@ -59,18 +52,51 @@ def register(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    return schemas.UserResponse.from_orm(new_user)
+
+def update_password_hash(db: Session, user: models.User, hashed_password: str) -> schemas.UserResponse:
+    user.hashed_password = hashed_password
+    db.commit()
+    db.refresh(user)
+    return schemas.UserResponse.from_orm(user)
+
+@app.post("/auth/register", response_model=schemas.Token)
+async def register(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
+    db_user = await run_in_threadpool(find_user_by_email, db, user.email)
+    if db_user:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    
+    hashed_password = await hashing.hash_password(user.password)
+    new_user = await run_in_threadpool(create_user, db, user, hashed_password)
     
-    access_token = auth.create_access_token(data={"sub": new_user.email})
+    access_token = auth.create_access_token(data={"sub": new_user.email, "uid": new_user.id})
     return {"access_token": access_token, "token_type": "bearer", "user": new_user}
 
 @app.post("/auth/login", response_model=schemas.Token)
-def login(user_credentials: schemas.UserLogin, db: Session = Depends(database.get_db)):
-    user = db.query(models.User).filter(models.User.email == user_credentials.email).first()
-    if not user or not auth.verify_password(user_credentials.password, user.hashed_password):
+async def login(user_credentials: schemas.UserLogin, db: Session = Depends(database.get_db)):
+    user = await run_in_threadpool(find_user_by_email, db, user_credentials.email)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    valid, new_hash = await hashing.verify_password(user_credentials.password, user.hashed_password)
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     
-    access_token = auth.create_access_token(data={"sub": user.email})
-    return {"access_token": access_token, "token_type": "bearer", "user": user}
+    if new_hash:
+        # Stored hash used an old work factor; upgrade it now that we know the password
+        user_resp = await run_in_threadpool(update_password_hash, db, user, new_hash)
+    else:
+        user_resp = schemas.UserResponse.from_orm(user)
+    access_token = auth.create_access_token(data={"sub": user_resp.email, "uid": user_resp.id})
+    return {"access_token": access_token, "token_type": "bearer", "user": user_resp}
+
+@app.on_event("shutdown")
+def stop_hashing_pool():
+    hashing.shutdown()
+
+@app.get("/auth/stats")
+def password_hash_stats():
+    # Hashing pool queue depth and latency, for monitoring
+    return hashing.stats.snapshot()
 
 @app.get("/auth/me", response_model=schemas.UserResponse)
 def read_users_me(current_user: models.User = Depends(auth.get_current_user)):
@@ -78,16 +104,44 @@ def read_users_me(current_user: models.User = Depends(auth.get_current_user)):
 
 # --- Product Endpoints ---
 
-@app.get("/products", response_model=List[schemas.ProductResponse])
+def highest_bidder_names(db: Session, products) -> Dict[int, str]:
+    # Works on ORM products and on column rows alike
+    auction_ids = [p.id for p in products if p.listing_type == 'auction' and p.current_highest_bid > 0]
+    return {product_id: top.username for product_id, top in bidding.top_bids(db, auction_ids).items()}
+
+def with_highest_bidders(db: Session, products: List[models.Product]) -> List[schemas.ProductResponse]:
+    names = highest_bidder_names(db, products)
+    results = []
+    for p in products:
+        p_resp = schemas.ProductResponse.from_orm(p)
+        p_resp.highest_bidder_username = names.get(p.id)
+        results.append(p_resp)
+    return results
+
+def product_page(db: Session, products, next_cursor, highlights: Dict[int, tuple] = None):
+    # Lean list path: column rows + bidder names -> one validation pass -> JSON
+    names = highest_bidder_names(db, products)
+    items = []
+    for p in products:
+        item = dict(p._mapping, highest_bidder_username=names.get(p.id))
+        if highlights and p.id in highlights:
+            item["title_highlight"], item["description_snippet"] = highlights[p.id]
+        items.append(item)
+    return serialization.page_response(schemas.ProductResponse, items, next_cursor)
+
+@app.get("/products", response_model=schemas.Page[schemas.ProductResponse])
 def get_products(
     category: str = None, 
     listing_type: str = None, 
     min_price: float = None,
     max_price: float = None,
     search: str = None,
+    sort: str = None, # Defaults to relevance when searching, newest otherwise
+    cursor: str = None,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
     db: Session = Depends(database.get_db)
 ):
-    query = db.query(models.Product).filter(models.Product.status == "active")
+    query = db.query(*serialization.PRODUCT_COLUMNS).filter(models.Product.status == "active")
     if category:
         query = query.filter(models.Product.category == category)
     if listing_type:
@@ -99,22 +153,27 @@ def get_products(
     if max_price is not None:
         query = query.filter((models.Product.price <= max_price) | (models.Product.current_highest_bid <= max_price))
         
-    if search:
-        query = query.filter(models.Product.title.contains(search) | models.Product.description.contains(search))
-        
-    products = query.all()
-    
-    # Populate highest_bidder_username manually
-    results = []
-    for p in products:
-        p_resp = schemas.ProductResponse.from_orm(p)
-        if p.listing_type == 'auction' and p.current_highest_bid > 0:
-            highest_bid = db.query(models.Bid).filter(models.Bid.product_id == p.id).order_by(models.Bid.amount.desc()).first()
-            if highest_bid and highest_bid.bidder:
-                p_resp.highest_bidder_username = highest_bid.bidder.username
-        results.append(p_resp)
+    search_matches = None
+    if search and fulltext.backend:
+        search_matches = fulltext.matches(search)
+    if search_matches is not None:
+        query = query.join(search_matches, search_matches.c.id == models.Product.id)
+    elif search:
+        # No index, or no terms the index can match (e.g. only punctuation)
+        query = query.filter(fulltext.like_filter(search))
+
+    sort = sort or ("relevance" if search_matches is not None else "newest")
+    if sort == "relevance" and search_matches is not None:
+        query = query.add_columns(search_matches.c.rank.label("search_rank"))
+        sort_key = pagination.relevance_sort(search_matches.c.rank)
+    else:
+        sort_key = pagination.product_sort(sort)
 
-    return results
+    products, next_cursor = pagination.paginate(query, sort_key, cursor, limit)
+    marked = None
+    if search_matches is not None:
+        marked = fulltext.highlights(db, search, [p.id for p in products])
+    return product_page(db, products, next_cursor, marked)
 
 @app.post("/products", response_model=schemas.ProductResponse)
 def create_product(
@@ -138,81 +197,105 @@ def create_product(
     db.add(new_product)
     db.commit()
     db.refresh(new_product)
+    if new_product.listing_type == 'auction':
+        auction_scheduler.schedule(new_product.id, new_product.end_time)
+    response_cache.invalidate(new_product.id)
     return new_product
 
+# Conditional GETs and short-lived caching for catalogue reads
+response_cache = httpcache.ResponseCache()
+
+@app.middleware("http")
+async def cache_catalogue_reads(request: Request, call_next):
+    return await response_cache.serve(request, call_next)
+
+@app.get("/cache/stats")
+def http_cache_stats():
+    return response_cache.stats()
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    # Turn away oversized uploads before the multipart body is read
+    if request.url.path == "/upload":
+        length = request.headers.get("content-length")
+        # Allow a little room for the multipart framing around the file
+        if length and length.isdigit() and int(length) > images.IMAGE_UPLOAD_MAX_BYTES + 16 * 1024:
+            return JSONResponse(status_code=413, content={"detail": "Image too large"})
+    return await call_next(request)
+
 @app.post("/upload")
 async def upload_image(file: UploadFile = File(...)):
-    # Generate unique filename
-    file_extension = file.filename.split(".")[-1]
-    unique_filename = f"{uuid.uuid4()}.{file_extension}"
-    file_path = f"static/images/{unique_filename}"
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-        
-    return {"url": f"/static/images/{unique_filename}"}
+    # Stored under its content hash with WebP variants; "url" stays the original for older clients
+    urls = await images.save_upload(file)
+    return {"url": urls["original"], "urls": urls}
+
+@app.on_event("shutdown")
+def stop_image_pool():
+    images.shutdown()
 
 @app.get("/products/{product_id}", response_model=schemas.ProductResponse)
 def get_product(product_id: int, db: Session = Depends(database.get_db)):
+    # Live auctions are served from the hot cache, kept current by bid events
+    state = live_state.load(db, product_id)
+    if state is not None:
+        return state.product
     product = db.query(models.Product).filter(models.Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    p_resp = schemas.ProductResponse.from_orm(product)
-    
-    if product.listing_type == 'auction' and product.current_highest_bid > 0:
-        highest_bid = db.query(models.Bid).filter(models.Bid.product_id == product.id).order_by(models.Bid.amount.desc()).first()
-        if highest_bid and highest_bid.bidder:
-            p_resp.highest_bidder_username = highest_bid.bidder.username
-            
-    return p_resp
+    return with_highest_bidders(db, [product])[0]
+
+# Retries of bids and purchases sent with an Idempotency-Key replay the first outcome
+write_once = idempotency.IdempotencyStore()
 
 @app.post("/products/{product_id}/buy")
-def buy_product(
+async def buy_product(
     product_id: int, 
+    request: Request,
+    purchase: schemas.PurchaseCreate = None, # Optional body; one unit without it
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
-    product = db.query(models.Product).filter(models.Product.id == product_id).with_for_update().first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    if product.listing_type != 'direct':
-        raise HTTPException(status_code=400, detail="This is not a direct purchase item")
-    if product.status != 'active':
-        raise HTTPException(status_code=400, detail="Item not available")
-    if product.stock < 1:
-        raise HTTPException(status_code=400, detail="Out of stock") # Should check stock logic if we actually decrement
-        
-    # Create Transaction
-    commission_rate = 0.05 # Default 5%
-    total_amount = product.price
-    commission_amount = total_amount * commission_rate
-    net_seller_amount = total_amount - commission_amount
-    
-    transaction = models.Transaction(
-        product_id=product.id,
-        buyer_id=current_user.id,
-        seller_id=product.seller_id,
-        total_amount=total_amount,
-        commission_rate=commission_rate,
-        commission_amount=commission_amount,
-        net_seller_amount=net_seller_amount,
-        status="completed" # Assuming instant payment for now
-    )
-    
-    product.status = 'sold'
-    product.stock -= 1
-    
-    db.add(transaction)
-    db.commit()
-    return {"message": "Purchase successful", "transaction_id": transaction.id}
-    
-@app.post("/products/{product_id}/close_auction")
-def close_auction(
-    product_id: int,
+    quantity = purchase.quantity if purchase else 1
+    user_id = current_user.id
+
+    async def buy():
+        receipt = await run_in_threadpool(purchases.checkout, db, user_id, {product_id: quantity})
+        response_cache.invalidate(product_id)
+        return {"message": "Purchase successful", "transaction_id": receipt[0]["transaction_id"], "quantity": quantity}
+
+    return await write_once.run(user_id, idempotency_key, request, buy)
+
+@app.post("/checkout", response_model=schemas.CheckoutResponse)
+async def checkout_cart(
+    cart: schemas.CheckoutCreate,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
-    product = db.query(models.Product).filter(models.Product.id == product_id).with_for_update().first()
+    # All or nothing: one transaction for the whole cart
+    quantities: Dict[int, int] = {}
+    for item in cart.items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    user_id = current_user.id
+
+    async def pay():
+        receipt = await run_in_threadpool(purchases.checkout, db, user_id, quantities)
+        for product_id in quantities:
+            response_cache.invalidate(product_id)
+        return {
+            "message": "Checkout successful",
+            "total_amount": sum(line["total_amount"] for line in receipt),
+            "items": receipt,
+        }
+
+    return await write_once.run(user_id, idempotency_key, request, pay)
+    
+def closable_auction(db: Session, product_id: int, current_user: models.User, lock: bool = False) -> models.Product:
+    query = db.query(models.Product).filter(models.Product.id == product_id)
+    # Locked re-read: refresh the row even if the unlocked check already loaded it
+    product = (query.with_for_update().populate_existing() if lock else query).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
@@ -225,36 +308,37 @@ def close_auction(
         raise HTTPException(status_code=400, detail="Not an auction")
     if product.status != 'active':
         raise HTTPException(status_code=400, detail="Auction already closed")
+    return product
+
+def close_auction_now(db: Session, product_id: int, current_user: models.User):
+    product = closable_auction(db, product_id, current_user, lock=True)
         
-    # Determine winner
-    highest_bid = db.query(models.Bid).filter(models.Bid.product_id == product_id).order_by(models.Bid.amount.desc()).first()
-    
-    if not highest_bid:
-        product.status = 'ended'
-        db.commit()
-        return {"message": "Auction ended with no bids"}
-        
-    # Execute Transaction
-    commission_rate = 0.05
-    total_amount = highest_bid.amount
-    commission_amount = total_amount * commission_rate
-    net_seller_amount = total_amount - commission_amount
-    
-    transaction = models.Transaction(
-        product_id=product.id,
-        buyer_id=highest_bid.user_id,
-        seller_id=product.seller_id,
-        total_amount=total_amount,
-        commission_rate=commission_rate,
-        commission_amount=commission_amount,
-        net_seller_amount=net_seller_amount,
-        status="pending" # Winner needs to pay? Or assume auto-charge?
-    )
-    
-    product.status = 'sold'
-    db.add(transaction)
+    # Determine winner and execute Transaction
+    winner = bidding.top_bids(db, [product_id]).get(product_id)
+    event = bidding.settle_auction(db, product.id, product.seller_id, winner)
     db.commit()
-    return {"message": "Auction closed, winner declared", "winner_id": highest_bid.user_id}
+    if event is None:
+        # Closed by the scheduler or another request since we loaded it
+        raise HTTPException(status_code=400, detail="Auction already closed")
+    
+    if not winner:
+        return {"message": "Auction ended with no bids"}, event
+    return {"message": "Auction closed, winner declared", "winner_id": winner.user_id}, event
+
+@app.post("/products/{product_id}/close_auction")
+async def close_auction(
+    product_id: int,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    # Checked before the hold, so only the seller or an admin can pause bidding on it
+    await run_in_threadpool(closable_auction, db, product_id, current_user)
+    # The winner is picked from the bids table, so queued bids must be written first
+    async with bid_writer.hold([product_id]):
+        result, event = await run_in_threadpool(close_auction_now, db, product_id, current_user)
+    response_cache.invalidate(product_id)
+    await bid_events.publish(product_id, json.dumps(event))
+    return result
 
 # --- Admin Endpoints ---
 
@@ -273,122 +357,259 @@ def approve_seller(user_id: int, db: Session = Depends(database.get_db), current
         raise HTTPException(status_code=404, detail="User not found")
     user.is_approved = True
     db.commit()
+    auth.invalidate_user(user.id)
     return {"message": f"User {user.username} approved"}
 
 # --- User Dashboard Endpoints ---
 
-@app.get("/users/me/products", response_model=List[schemas.ProductResponse])
-def get_my_products(db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
-    return db.query(models.Product).filter(models.Product.seller_id == current_user.id).all()
-
-@app.get("/users/me/bids", response_model=List[schemas.BidResponse])
-def get_my_bids(db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
-    return db.query(models.Bid).filter(models.Bid.user_id == current_user.id).order_by(models.Bid.timestamp.desc()).all()
+@app.get("/users/me/summary", response_model=schemas.DashboardSummary)
+def get_my_summary(db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+    # Primary-key reads of the maintained aggregates, however long the user's history
+    return dashboard.summary(db, current_user.id, datetime.utcnow())
 
-# We need a Transaction Response schema but let's just return dict or create one quickly
-@app.get("/users/me/orders")
-def get_my_orders(db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
-    # Buyer orders
-    orders = db.query(models.Transaction).filter(models.Transaction.buyer_id == current_user.id).all()
-    # We might want to include Product details? 
-    # For simplicity, returning raw transaction but we should probably join with Product.
-    return orders
+@app.get("/users/me/products", response_model=schemas.Page[schemas.ProductResponse])
+def get_my_products(
+    sort: str = "newest",
+    cursor: str = None,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    query = db.query(*serialization.PRODUCT_COLUMNS).filter(models.Product.seller_id == current_user.id)
+    products, next_cursor = pagination.paginate(query, pagination.product_sort(sort), cursor, limit)
+    return product_page(db, products, next_cursor)
+
+@app.get("/users/me/bids", response_model=schemas.Page[schemas.BidHistoryResponse])
+def get_my_bids(
+    cursor: str = None,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    # One joined query for the page, whatever its size: each bid with its auction's state
+    query = db.query(
+        *serialization.BID_COLUMNS,
+        *serialization.PRODUCT_SUMMARY_COLUMNS,
+        models.Product.status.label("product_status"),
+        models.Product.current_highest_bid,
+        models.Product.end_time,
+        # Bids only ever raise the price, so the highest bid is the one that set it
+        (models.Bid.amount >= models.Product.current_highest_bid).label("is_winning"),
+    ).join(models.Product, models.Product.id == models.Bid.product_id) \
+        .filter(models.Bid.user_id == current_user.id)
+    bids, next_cursor = pagination.paginate(query, pagination.BIDS_BY_TIME, cursor, limit)
+    items = [dict(b._mapping, username=current_user.username) for b in bids]
+    return serialization.page_response(schemas.BidHistoryResponse, items, next_cursor)
+
+@app.get("/users/me/orders", response_model=schemas.Page[schemas.OrderResponse])
+def get_my_orders(
+    cursor: str = None,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    # Buyer orders, with the product and seller joined in: one query for the page
+    query = db.query(
+        *serialization.TRANSACTION_COLUMNS,
+        *serialization.PRODUCT_SUMMARY_COLUMNS,
+        models.Product.listing_type,
+        models.User.username.label("seller_username"),
+    ).join(models.Product, models.Product.id == models.Transaction.product_id) \
+        .join(models.User, models.User.id == models.Transaction.seller_id) \
+        .filter(models.Transaction.buyer_id == current_user.id)
+    orders, next_cursor = pagination.paginate(query, pagination.TRANSACTIONS_BY_TIME, cursor, limit)
+    return serialization.page_response(schemas.OrderResponse, orders, next_cursor)
 
 
 
 # --- Bidding Endpoints & WebSocket ---
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
-
-manager = ConnectionManager()
+manager = realtime.ConnectionManager()
+# Bids are published on the bus and every worker fans them out to its own sockets
+bid_events = pubsub.create_event_bus()
+# Accepts bids in memory and writes them in group commits, if BID_WRITE_BEHIND is on
+bid_writer = write_behind.WriteBehindBidLog()
+# Closes auctions at their end_time and announces it on the bus
+auction_scheduler = scheduler.AuctionScheduler(bid_events.publish, bid_writer.hold)
+# Hot state of active auctions, updated from the same events the sockets receive
+live_state = live_auctions.LiveAuctionCache(bid_writer.pending_bids if write_behind.BID_WRITE_BEHIND else None)
+
+async def on_bid_event(product_id: int, message: str):
+    live_state.apply_event(product_id, message)
+    # Bids and closes on any worker reach every worker here, so their caches follow
+    response_cache.invalidate(product_id)
+    await manager.broadcast(product_id, message)
+
+@app.on_event("startup")
+async def start_bid_events():
+    await bid_events.start(on_bid_event)
+    if write_behind.BID_WRITE_BEHIND:
+        # Replays the journal of a crashed run before anything can close its auctions
+        await bid_writer.start()
+    if scheduler.AUCTION_SCHEDULER_ENABLED:
+        await auction_scheduler.start()
+
+@app.on_event("shutdown")
+async def stop_bid_events():
+    await auction_scheduler.stop()
+    await bid_writer.stop()
+    await bid_events.stop()
+
+def resume_snapshot(product_id: int, since: int):
+    """Snapshot of the bids after `since` for a reconnecting socket, or None if the product is gone."""
+    db = database.SessionLocal()
+    try:
+        state = live_state.load(db, product_id)
+        # The cache holds the newest bids; it covers the gap if it reaches back to `since`
+        if state is not None and (state.bid_count == len(state.top_bids) or state.top_bids[-1].id <= since):
+            bids = [b._asdict() for b in state.top_bids if b.id > since]
+            truncated = len(bids) > realtime.WS_SNAPSHOT_MAX_BIDS
+            product = state.product
+        else:
+            product = db.query(models.Product).filter(models.Product.id == product_id).first()
+            if not product:
+                return None
+            product = with_highest_bidders(db, [product])[0]
+            rows = db.query(models.Bid, models.User.username) \
+                .join(models.User, models.User.id == models.Bid.user_id) \
+                .filter(models.Bid.product_id == product_id, models.Bid.id > since) \
+                .order_by(models.Bid.id.desc()) \
+                .limit(realtime.WS_SNAPSHOT_MAX_BIDS + 1).all()
+            bids = [dict(schemas.BidResponse.from_orm(b), username=username) for b, username in rows]
+            truncated = len(bids) > realtime.WS_SNAPSHOT_MAX_BIDS
+        bids = bids[:realtime.WS_SNAPSHOT_MAX_BIDS]
+        for b in bids:
+            b["timestamp"] = str(b["timestamp"])
+        return realtime.snapshot_message(
+            product_id, bids, product.current_highest_bid, product.highest_bidder_username,
+            truncated, status=product.status,
+        )
+    finally:
+        db.close()
 
 @app.websocket("/ws/bids/{product_id}")
-async def websocket_endpoint(websocket: WebSocket, product_id: int):
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, product_id: int, mode: str = "live", since: int = None):
+    # mode=snapshot: coalesce bid bursts into one message per interval (slow clients).
+    # since=<seq>: resume after a reconnect with only the bids missed since that event.
+    await manager.connect(websocket, product_id, throttled=(mode == "snapshot"), hold=since is not None)
     try:
+        if since is not None:
+            snapshot = await run_in_threadpool(resume_snapshot, product_id, since)
+            if snapshot is None:
+                manager.disconnect(websocket, product_id)
+                await websocket.close(code=1008)
+                return
+            await websocket.send_text(snapshot)
+            await manager.release(websocket, product_id)
         while True:
             data = await websocket.receive_text()
             # client sends nothing really, just listens usually. 
-            # Or client sends a 'ping'
-            await manager.broadcast(f"Update for {product_id}")
+            # Or client sends a 'ping': answer it alone, a room broadcast would defeat snapshot throttling
+            await websocket.send_text(json.dumps({"type": "pong"}))
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        manager.disconnect(websocket, product_id)
+
+@app.get("/ws/stats")
+def websocket_stats():
+    # Subscriber counts per auction room, for monitoring
+    return {
+        "total_connections": manager.total_connections,
+        "snapshot_connections": manager.throttled_connections,
+        "rooms": manager.room_counts(),
+    }
 
 @app.post("/products/{product_id}/bid", response_model=schemas.BidResponse)
 async def place_bid(
     product_id: int, 
     bid: schemas.BidCreate, 
+    request: Request,
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
-    product = db.query(models.Product).filter(models.Product.id == product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    if product.listing_type != 'auction':
-        raise HTTPException(status_code=400, detail="This is not an auction")
-    if product.status != 'active':
-        raise HTTPException(status_code=400, detail="Auction is not active")
-    if product.end_time and datetime.utcnow() > product.end_time:
-        product.status = 'ended'
-        db.commit()
-        raise HTTPException(status_code=400, detail="Auction has ended")
+    # This handler is async for the broadcast, but the session is synchronous:
+    # run the DB work in the threadpool so a slow commit doesn't stall every WebSocket.
+    # Read the user first - the commit expires it and reloading would hit the DB here.
+    user_id, username = current_user.id, current_user.username
+
+    async def submit_bid():
+        # Bids the cache already knows are too low or too late never reach the database
+        live_state.precheck(product_id, bid.amount, datetime.utcnow())
+        if write_behind.BID_WRITE_BEHIND:
+            new_bid = await bid_writer.place(product_id, user_id, bid.amount)
+        else:
+            new_bid = await run_in_threadpool(bidding.place_bid, db, product_id, user_id, bid.amount)
+        response_cache.invalidate(product_id)
         
-    # Check amount
-    min_required = product.current_highest_bid + product.min_bid_increment
-    if bid.amount < min_required:
-        raise HTTPException(status_code=400, detail=f"Bid must be at least {min_required}")
-
-    # Create Bid
-    new_bid = models.Bid(
-        product_id=product_id,
-        user_id=current_user.id,
-        amount=bid.amount
-    )
-    
-    # Update Product
-    product.current_highest_bid = bid.amount
-    
-    db.add(new_bid)
-    db.commit()
-    db.refresh(new_bid)
-    
-    # Notify WebSocket clients
-    # Send JSON for richer UI update
-    import json
-    msg = json.dumps({
-        "type": "new_bid",
-        "product_id": product_id,
-        "amount": bid.amount,
-        "username": current_user.username,
-        "timestamp": str(datetime.utcnow())
-    })
-    await manager.broadcast(msg)
-    
-    # Return response with username manually added for the immediate HTTP response
-    response = schemas.BidResponse.from_orm(new_bid)
-    response.username = current_user.username
-    return response
-
-@app.get("/products/{product_id}/bids", response_model=List[schemas.BidResponse])
-def get_product_bids(product_id: int, db: Session = Depends(database.get_db)):
-    bids = db.query(models.Bid).filter(models.Bid.product_id == product_id).order_by(models.Bid.amount.desc()).all()
-    # Manually populate username if not done by ORM (it should be if mapped, but let's ensure)
-    results = []
-    for b in bids:
-        resp = schemas.BidResponse.from_orm(b)
-        resp.username = b.bidder.username if b.bidder else "Unknown"
-        results.append(resp)
-    return results
+        # Notify WebSocket clients
+        # Send JSON for richer UI update
+        msg = json.dumps({
+            "type": "new_bid",
+            "product_id": product_id,
+            "bid_id": new_bid.id,
+            "user_id": user_id,
+            "amount": bid.amount,
+            "username": username,
+            "timestamp": str(new_bid.timestamp)
+        })
+        await bid_events.publish(product_id, msg)
+        
+        # Return response with username manually added for the immediate HTTP response
+        response = schemas.BidResponse.from_orm(new_bid)
+        response.username = username
+        return response
+
+    # A retried request gets the first one's response, without another write or broadcast
+    return await write_once.run(user_id, idempotency_key, request, submit_bid)
+
+@app.get("/products/{product_id}/bids", response_model=schemas.Page[schemas.BidResponse])
+def get_product_bids(
+    product_id: int,
+    cursor: str = None,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    db: Session = Depends(database.get_db)
+):
+    if not cursor:
+        state = live_state.load(db, product_id)
+        page = live_state.bids_page(state, limit) if state is not None else None
+        if page is not None:
+            return page
+    query = db.query(*serialization.BID_COLUMNS, models.User.username) \
+        .join(models.User, models.User.id == models.Bid.user_id) \
+        .filter(models.Bid.product_id == product_id)
+    bids, next_cursor = pagination.paginate(query, pagination.BIDS_BY_AMOUNT, cursor, limit)
+    return serialization.page_response(schemas.BidResponse, bids, next_cursor)
+
+# Opt-in latency/query metrics and per-request profiling; outside the cache so hits are timed too
+if instrumentation.INSTRUMENTATION_ENABLED:
+    instrumentation.instrument_engine(database.engine)
+    instrumentation.metrics.gauge("db_pool_checked_out", "Connections in use.",
+                                  lambda: database.pool_status()["checked_out"])
+    instrumentation.metrics.gauge("db_pool_overflow", "Connections open beyond the pool size.",
+                                  lambda: database.pool_status()["overflow"])
+    instrumentation.metrics.gauge("password_hashes_in_flight", "Hashes queued or running.",
+                                  lambda: hashing.stats.snapshot()["in_flight"])
+    instrumentation.metrics.gauge("websocket_connections", "Open bid sockets.",
+                                  lambda: manager.total_connections)
+
+    @app.middleware("http")
+    async def instrument_requests(request: Request, call_next):
+        return await instrumentation.instrument(request, call_next)
+
+    @app.get("/metrics", include_in_schema=False)
+    def prometheus_metrics():
+        return PlainTextResponse(instrumentation.metrics.render(), media_type="text/plain; version=0.0.4")
+
+# CORS - added last so it is the outermost middleware and also covers
+# responses the middleware above return without calling the endpoint
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=[
+        "http://localhost:5173",
+        "https://vortex-1-n5fc.onrender.com",
+        "https://vortex-frontend-4ij4.onrender.com"
+    ],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
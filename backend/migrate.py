@@ -0,0 +1,40 @@
+import os
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect, text
+
+import database
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+
+# Revision matching the schema that Base.metadata.create_all used to build
+BASELINE_REVISION = "0001"
+
+# Arbitrary key so concurrent workers starting up run migrations one at a time
+_PG_MIGRATION_LOCK = 745301
+
+
+def _config(connection) -> Config:
+    config = Config(ALEMBIC_INI)
+    config.attributes["connection"] = connection
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def upgrade(revision: str = "head"):
+    """Brings the database schema up to date. Called on app startup and from deploy."""
+    with database.engine.begin() as connection:
+        if connection.dialect.name == "postgresql":
+            connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _PG_MIGRATION_LOCK})
+        tables = inspect(connection).get_table_names()
+        config = _config(connection)
+        if "alembic_version" not in tables and "users" in tables:
+            # Database created by create_all before migrations existed
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, revision)
+
+
+if __name__ == "__main__":
+    upgrade()
+    print("Database is up to date")
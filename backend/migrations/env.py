@@ -0,0 +1,65 @@
+from logging.config import fileConfig
+
+from alembic import context
+
+import database
+import fulltext
+import models
+
+config = context.config
+
+# Only configure logging when run from the alembic CLI; migrate.upgrade()
+# runs inside the app and keeps the app's logging setup.
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = models.Base.metadata
+
+
+def include_name(name, type_, parent_names):
+    # The full-text index is managed by fulltext.setup(), not by the models:
+    # the SQLite FTS5 tables and the Postgres GIN expression index
+    if type_ == "table":
+        return not name.startswith("products_fts")
+    if type_ == "index":
+        return name != fulltext.PG_SEARCH_INDEX
+    return True
+
+
+def run_migrations_offline():
+    context.configure(
+        url=database.SQLALCHEMY_DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        include_name=include_name,
+        render_as_batch=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run(connection)
+        return
+    with database.engine.connect() as connection:
+        _run(connection)
+
+
+def _run(connection):
+    # Batch mode lets ALTERs work on SQLite by rebuilding the table
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_name=include_name,
+        render_as_batch=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,103 @@
+"""initial schema
+
+Tables as created by Base.metadata.create_all before migrations existed.
+Databases created that way are stamped at this revision by migrate.upgrade().
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("username", sa.String(), nullable=True),
+        sa.Column("email", sa.String(), nullable=True),
+        sa.Column("hashed_password", sa.String(), nullable=True),
+        sa.Column("role", sa.String(), nullable=True),
+        sa.Column("is_approved", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "products",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("seller_id", sa.Integer(), nullable=True),
+        sa.Column("title", sa.String(), nullable=True),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("category", sa.String(), nullable=True),
+        sa.Column("images", sa.JSON(), nullable=True),
+        sa.Column("listing_type", sa.String(), nullable=True),
+        sa.Column("status", sa.String(), nullable=True),
+        sa.Column("price", sa.Float(), nullable=True),
+        sa.Column("stock", sa.Integer(), nullable=True),
+        sa.Column("start_bid", sa.Float(), nullable=True),
+        sa.Column("min_bid_increment", sa.Float(), nullable=True),
+        sa.Column("current_highest_bid", sa.Float(), nullable=True),
+        sa.Column("end_time", sa.DateTime(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["seller_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_products_id", "products", ["id"])
+    op.create_index("ix_products_title", "products", ["title"])
+    op.create_index("ix_products_category", "products", ["category"])
+
+    op.create_table(
+        "bids",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("product_id", sa.Integer(), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("amount", sa.Float(), nullable=True),
+        sa.Column("timestamp", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["product_id"], ["products.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_bids_id", "bids", ["id"])
+
+    op.create_table(
+        "transactions",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("product_id", sa.Integer(), nullable=True),
+        sa.Column("buyer_id", sa.Integer(), nullable=True),
+        sa.Column("seller_id", sa.Integer(), nullable=True),
+        sa.Column("total_amount", sa.Float(), nullable=True),
+        sa.Column("commission_rate", sa.Float(), nullable=True),
+        sa.Column("commission_amount", sa.Float(), nullable=True),
+        sa.Column("net_seller_amount", sa.Float(), nullable=True),
+        sa.Column("status", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["product_id"], ["products.id"]),
+        sa.ForeignKeyConstraint(["buyer_id"], ["users.id"]),
+        sa.ForeignKeyConstraint(["seller_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_transactions_id", "transactions", ["id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("transactions")
+    op.drop_table("bids")
+    op.drop_table("products")
+    op.drop_table("users")
@@ -0,0 +1,42 @@
+"""composite indexes for hot query shapes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:01
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Catalogue filters, and the default newest-first listing
+    op.create_index("ix_products_status_category_type", "products", ["status", "category", "listing_type"])
+    op.create_index("ix_products_status_created", "products", ["status", "created_at", "id"])
+    # Seller dashboard
+    op.create_index("ix_products_seller_created", "products", ["seller_id", "created_at", "id"])
+    # Highest bid per product, bid history by amount
+    op.create_index("ix_bids_product_amount", "bids", ["product_id", sa.text("amount DESC"), "id"])
+    # Buyer dashboard
+    op.create_index("ix_bids_user_timestamp", "bids", ["user_id", "timestamp", "id"])
+    op.create_index("ix_transactions_buyer_created", "transactions", ["buyer_id", "created_at", "id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_transactions_buyer_created", table_name="transactions")
+    op.drop_index("ix_bids_user_timestamp", table_name="bids")
+    op.drop_index("ix_bids_product_amount", table_name="bids")
+    op.drop_index("ix_products_seller_created", table_name="products")
+    op.drop_index("ix_products_status_created", table_name="products")
+    op.drop_index("ix_products_status_category_type", table_name="products")
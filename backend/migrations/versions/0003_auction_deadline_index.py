@@ -0,0 +1,28 @@
+"""index active auctions by deadline for the auction scheduler
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:02
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_products_status_end_time", "products", ["status", "end_time"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_products_status_end_time", table_name="products")
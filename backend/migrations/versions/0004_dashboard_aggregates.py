@@ -0,0 +1,72 @@
+"""dashboard aggregate tables, backfilled from existing rows
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 00:00:03
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "seller_stats",
+        sa.Column("seller_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("period", sa.String(), primary_key=True),
+        sa.Column("sales_count", sa.Integer(), nullable=False),
+        sa.Column("gross_amount", sa.Float(), nullable=False),
+        sa.Column("commission_amount", sa.Float(), nullable=False),
+        sa.Column("net_amount", sa.Float(), nullable=False),
+    )
+    op.create_table(
+        "buyer_stats",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("active_bids", sa.Integer(), nullable=False),
+        sa.Column("winning_bids", sa.Integer(), nullable=False),
+        sa.Column("orders_count", sa.Integer(), nullable=False),
+        sa.Column("total_spent", sa.Float(), nullable=False),
+    )
+    op.create_table(
+        "auction_bidders",
+        sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id"), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+    )
+
+    # Backfill (same result as `python dashboard.py --rebuild`, frozen at this schema)
+    month = "to_char(created_at, 'YYYY-MM')" if op.get_bind().dialect.name == "postgresql" \
+        else "strftime('%Y-%m', created_at)"
+    sums = "COUNT(*), SUM(total_amount), SUM(commission_amount), SUM(net_seller_amount)"
+    op.execute(f"INSERT INTO seller_stats SELECT seller_id, 'all', {sums} FROM transactions GROUP BY seller_id")
+    op.execute(f"INSERT INTO seller_stats SELECT seller_id, {month}, {sums} FROM transactions GROUP BY seller_id, {month}")
+    op.execute(
+        "INSERT INTO auction_bidders SELECT DISTINCT b.product_id, b.user_id FROM bids b "
+        "JOIN products p ON p.id = b.product_id WHERE p.status = 'active' AND p.listing_type = 'auction'")
+    op.execute(
+        "INSERT INTO buyer_stats "
+        "SELECT u.id, "
+        "(SELECT COUNT(*) FROM auction_bidders ab WHERE ab.user_id = u.id), "
+        "(SELECT COUNT(*) FROM auction_bidders ab WHERE ab.user_id = u.id AND u.id = "
+        " (SELECT b.user_id FROM bids b WHERE b.product_id = ab.product_id ORDER BY b.amount DESC, b.id LIMIT 1)), "
+        "(SELECT COUNT(*) FROM transactions t WHERE t.buyer_id = u.id), "
+        "(SELECT COALESCE(SUM(t.total_amount), 0) FROM transactions t WHERE t.buyer_id = u.id) "
+        "FROM users u "
+        "WHERE EXISTS (SELECT 1 FROM auction_bidders ab WHERE ab.user_id = u.id) "
+        "OR EXISTS (SELECT 1 FROM transactions t WHERE t.buyer_id = u.id)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("auction_bidders")
+    op.drop_table("buyer_stats")
+    op.drop_table("seller_stats")
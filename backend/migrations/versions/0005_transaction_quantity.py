@@ -0,0 +1,30 @@
+"""quantity on transactions, for multi-unit purchases
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 00:00:04
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Every existing transaction was for a single unit
+    op.add_column("transactions", sa.Column("quantity", sa.Integer(), nullable=True, server_default="1"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("transactions") as batch_op:
+        batch_op.drop_column("quantity")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, Float, ForeignKey, DateTime, JSON, Text
+from sqlalchemy import Column, Integer, String, Boolean, Float, ForeignKey, DateTime, JSON, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -70,6 +70,7 @@ class Transaction(Base):
     buyer_id = Column(Integer, ForeignKey("users.id"))
     seller_id = Column(Integer, ForeignKey("users.id"))
     
+    quantity = Column(Integer, default=1) # Units bought; always 1 for auctions
     total_amount = Column(Float) # The final price paid
     commission_rate = Column(Float, default=0.05) # Stored at time of transaction
     commission_amount = Column(Float) # Calculated fee
@@ -81,3 +82,52 @@ class Transaction(Base):
     product = relationship("Product")
     buyer = relationship("User", foreign_keys=[buyer_id])
     seller = relationship("User", foreign_keys=[seller_id])
+
+# --- Dashboard aggregates (kept up to date by dashboard.py, rebuilt from the tables above) ---
+
+class SellerStats(Base):
+    __tablename__ = "seller_stats"
+
+    seller_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    period = Column(String, primary_key=True) # "all", or a month as "YYYY-MM"
+    sales_count = Column(Integer, default=0, nullable=False)
+    gross_amount = Column(Float, default=0.0, nullable=False)
+    commission_amount = Column(Float, default=0.0, nullable=False)
+    net_amount = Column(Float, default=0.0, nullable=False)
+
+class BuyerStats(Base):
+    __tablename__ = "buyer_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    active_bids = Column(Integer, default=0, nullable=False) # Active auctions the user has bid on
+    winning_bids = Column(Integer, default=0, nullable=False) # ...of which they are the highest bidder
+    orders_count = Column(Integer, default=0, nullable=False)
+    total_spent = Column(Float, default=0.0, nullable=False)
+
+class AuctionBidder(Base):
+    # Who has bid on each active auction; rows are removed when it closes
+    __tablename__ = "auction_bidders"
+
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+
+class IdempotencyKey(Base):
+    # Outcome of a bid/purchase sent with an Idempotency-Key, replayed to retries (see idempotency.py)
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False) # sha256 of method, path and body
+    status_code = Column(Integer, nullable=True) # NULL while the first request is still running
+    response_body = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+# Composite indexes for the hot query shapes (see migrations/versions/0002_composite_indexes.py)
+Index("ix_products_status_category_type", Product.status, Product.category, Product.listing_type)
+Index("ix_products_status_created", Product.status, Product.created_at, Product.id)
+Index("ix_products_seller_created", Product.seller_id, Product.created_at, Product.id)
+# Auction scheduler: active auctions by deadline
+Index("ix_products_status_end_time", Product.status, Product.end_time)
+Index("ix_bids_product_amount", Bid.product_id, Bid.amount.desc(), Bid.id)
+Index("ix_bids_user_timestamp", Bid.user_id, Bid.timestamp, Bid.id)
+Index("ix_transactions_buyer_created", Transaction.buyer_id, Transaction.created_at, Transaction.id)
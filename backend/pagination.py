@@ -0,0 +1,123 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, case, func, or_
+
+import models
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Stand-in for "no end time" so open-ended listings sort last when ordering by end_time
+FAR_FUTURE = datetime(9999, 12, 31)
+
+
+class SortKey:
+    """A keyset ordering: one sort expression plus the primary key as tie-breaker.
+
+    `value` reads the sort expression back off a loaded row so the next cursor
+    can be built without another query. Ties follow the sort direction unless
+    `ids_descending` says otherwise.
+    """
+
+    def __init__(self, name: str, column, id_column, value: Callable[[Any], Any], descending: bool = True,
+                 ids_descending: Optional[bool] = None):
+        self.name = name
+        self.column = column
+        self.id_column = id_column
+        self.value = value
+        self.descending = descending
+        self.ids_descending = descending if ids_descending is None else ids_descending
+
+    def order_by(self):
+        return [self.column.desc() if self.descending else self.column.asc(),
+                self.id_column.desc() if self.ids_descending else self.id_column.asc()]
+
+    def after(self, value, last_id):
+        later = self.column < value if self.descending else self.column > value
+        later_id = self.id_column < last_id if self.ids_descending else self.id_column > last_id
+        return or_(later, and_(self.column == value, later_id))
+
+
+def _dump(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _load(value):
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(sort: SortKey, row) -> str:
+    payload = json.dumps([sort.name, _dump(sort.value(row)), row.id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(sort: SortKey, cursor: str) -> Tuple[Any, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        name, value, last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if name != sort.name:
+        raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+    return _load(value), last_id
+
+
+def paginate(query, sort: SortKey, cursor: Optional[str], limit: int) -> Tuple[List[Any], Optional[str]]:
+    """Returns one page of `query` and the cursor for the page after it (None on the last page)."""
+    if cursor:
+        value, last_id = decode_cursor(sort, cursor)
+        query = query.filter(sort.after(value, last_id))
+    # Fetch one extra row to find out whether another page exists
+    rows = query.order_by(*sort.order_by()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(sort, rows[-1])
+
+
+# --- Sort orders used by the endpoints ---
+
+def _effective_price(p):
+    if p.listing_type == 'auction':
+        return p.current_highest_bid
+    return p.price if p.price is not None else 0
+
+
+# Auctions are priced by their current bid, direct listings by their price
+_price_column = case(
+    (models.Product.listing_type == 'auction', models.Product.current_highest_bid),
+    else_=func.coalesce(models.Product.price, 0),
+)
+_end_time_column = func.coalesce(models.Product.end_time, FAR_FUTURE)
+
+PRODUCT_SORTS = {
+    "newest": SortKey("newest", models.Product.created_at, models.Product.id, lambda p: p.created_at),
+    "oldest": SortKey("oldest", models.Product.created_at, models.Product.id, lambda p: p.created_at, descending=False),
+    "price_asc": SortKey("price_asc", _price_column, models.Product.id, _effective_price, descending=False),
+    "price_desc": SortKey("price_desc", _price_column, models.Product.id, _effective_price),
+    "ending_soon": SortKey("ending_soon", _end_time_column, models.Product.id, lambda p: p.end_time or FAR_FUTURE, descending=False),
+}
+
+# Tied bids earliest first: the earlier bid leads (see bidding.top_bids), as in ix_bids_product_amount
+BIDS_BY_AMOUNT = SortKey("amount", models.Bid.amount, models.Bid.id, lambda b: b.amount, ids_descending=False)
+BIDS_BY_TIME = SortKey("newest", models.Bid.timestamp, models.Bid.id, lambda b: b.timestamp)
+TRANSACTIONS_BY_TIME = SortKey("newest", models.Transaction.created_at, models.Transaction.id, lambda t: t.created_at)
+
+
+def relevance_sort(rank_column) -> SortKey:
+    # rank_column comes from fulltext.matches() and is selected alongside the product as search_rank
+    return SortKey("relevance", rank_column, models.Product.id, lambda p: p.search_rank, descending=False)
+
+
+def product_sort(name: str) -> SortKey:
+    if name not in PRODUCT_SORTS:
+        raise HTTPException(status_code=400, detail=f"Unknown sort '{name}'. Use one of: {', '.join(PRODUCT_SORTS)}")
+    return PRODUCT_SORTS[name]
@@ -0,0 +1,174 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Awaitable, Callable, Optional
+
+import database
+
+logger = logging.getLogger(__name__)
+
+# "memory" keeps events inside this process (single worker, local dev).
+# "postgres" fans them out to every worker/instance via LISTEN/NOTIFY.
+BID_EVENT_BACKEND = os.getenv("BID_EVENT_BACKEND", "memory")
+BID_EVENT_CHANNEL = os.getenv("BID_EVENT_CHANNEL", "vortex_bid_events")
+
+Handler = Callable[[int, str], Awaitable[None]]
+
+
+class InProcessEventBus:
+    """Delivers bid events straight to this worker's handler."""
+
+    def __init__(self):
+        self.handler: Optional[Handler] = None
+
+    async def start(self, handler: Handler):
+        self.handler = handler
+
+    async def stop(self):
+        self.handler = None
+
+    async def publish(self, product_id: int, message: str):
+        if self.handler is None:
+            return
+        try:
+            await self.handler(product_id, message)
+        except Exception:
+            # Published after the write committed: failing the request would invite a duplicate retry
+            logger.exception("Delivering bid event for %s failed", product_id)
+
+
+class PostgresEventBus:
+    """Bid events over Postgres LISTEN/NOTIFY so every worker sees every bid.
+
+    One connection LISTENs and is driven by the event loop's reader callback;
+    a second one is used to NOTIFY from a worker thread. Events are only
+    delivered through the listener, including to the publishing worker, so
+    every worker sees the same ordering. Each connection is re-established
+    on its own when it fails.
+
+    publish() never raises: it is called after the bid or close committed,
+    and an error there would make the client retry a write that succeeded.
+    A failed notification is logged and dropped; other workers' caches catch
+    up within their TTL.
+    """
+
+    def __init__(self, dsn: str, channel: str = BID_EVENT_CHANNEL):
+        self.dsn = dsn
+        self.channel = channel
+        self.handler: Optional[Handler] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.listen_conn = None
+        self.listen_fd = None
+        self.notify_conn = None
+        self.notify_lock: Optional[asyncio.Lock] = None
+
+    def _connect(self):
+        import psycopg2
+
+        conn = psycopg2.connect(self.dsn)
+        conn.autocommit = True
+        return conn
+
+    async def start(self, handler: Handler):
+        self.handler = handler
+        self.loop = asyncio.get_running_loop()
+        # Created here so it belongs to the running loop
+        self.notify_lock = asyncio.Lock()
+        await self._listen()
+        async with self.notify_lock:
+            self.notify_conn = await asyncio.to_thread(self._connect)
+
+    async def _listen(self):
+        conn = await asyncio.to_thread(self._connect)
+        with conn.cursor() as cur:
+            cur.execute(f'LISTEN "{self.channel}"')
+        self.listen_conn = conn
+        self.listen_fd = conn.fileno()
+        self.loop.add_reader(self.listen_fd, self._on_readable)
+
+    def _close_listener(self):
+        if self.listen_conn is not None:
+            self.loop.remove_reader(self.listen_fd)
+            try:
+                self.listen_conn.close()
+            except Exception:
+                pass
+            self.listen_conn = None
+
+    async def stop(self):
+        self.handler = None
+        self._close_listener()
+        if self.notify_lock is None:
+            return
+        async with self.notify_lock:
+            if self.notify_conn is not None:
+                self.notify_conn.close()
+                self.notify_conn = None
+
+    def _on_readable(self):
+        try:
+            self.listen_conn.poll()
+        except Exception:
+            logger.exception("Bid event listener connection failed")
+            self._close_listener()
+            self.loop.create_task(self._reconnect())
+            return
+        while self.listen_conn.notifies:
+            notify = self.listen_conn.notifies.pop(0)
+            try:
+                event = json.loads(notify.payload)
+            except ValueError:
+                continue
+            self.loop.create_task(self.handler(event["product_id"], event["message"]))
+
+    async def _reconnect(self):
+        # Only the listener; publishing keeps using its own connection meanwhile
+        while self.handler is not None:
+            try:
+                await self._listen()
+                return
+            except Exception:
+                logger.exception("Reconnecting bid event listener failed, retrying")
+                await asyncio.sleep(1)
+
+    def _notify(self, payload: str):
+        # Runs under notify_lock: reconnect if the last attempt broke the connection
+        if self.notify_conn is None or self.notify_conn.closed:
+            self.notify_conn = self._connect()
+        try:
+            with self.notify_conn.cursor() as cur:
+                cur.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+        except Exception:
+            try:
+                self.notify_conn.close()
+            except Exception:
+                pass
+            self.notify_conn = None
+            raise
+
+    async def publish(self, product_id: int, message: str):
+        if self.notify_lock is None:
+            return
+        payload = json.dumps({"product_id": product_id, "message": message})
+        async with self.notify_lock:
+            if self.handler is None:
+                return
+            # One retry covers a connection the server dropped since the last bid
+            for attempt in range(2):
+                try:
+                    await asyncio.to_thread(self._notify, payload)
+                    return
+                except Exception:
+                    if attempt:
+                        logger.exception("Publishing bid event for %s failed", product_id)
+
+
+def create_event_bus():
+    if BID_EVENT_BACKEND == "memory":
+        return InProcessEventBus()
+    if BID_EVENT_BACKEND == "postgres":
+        # psycopg2 understands plain postgresql:// URLs, not SQLAlchemy driver names
+        dsn = database.engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        return PostgresEventBus(dsn)
+    raise ValueError(f"Unknown BID_EVENT_BACKEND: {BID_EVENT_BACKEND}")
@@ -0,0 +1,84 @@
+from typing import Dict, List
+
+from fastapi import HTTPException
+from sqlalchemy import case
+from sqlalchemy.orm import Session
+
+import bidding
+import dashboard
+import models
+
+
+def _take_stock(db: Session, product_id: int, quantity: int) -> bool:
+    """Takes `quantity` units in one conditional UPDATE; False if they aren't there.
+
+    Like bidding.place_bid, the check and the write are one statement, so
+    concurrent buyers are serialized by the database only for the moment
+    the row is written, never on a lock taken up front. The listing turns
+    'sold' in the same statement that takes its last unit.
+    """
+    return bool(db.query(models.Product).filter(
+        models.Product.id == product_id,
+        models.Product.listing_type == 'direct',
+        models.Product.status == 'active',
+        models.Product.stock >= quantity,
+    ).update({
+        models.Product.stock: models.Product.stock - quantity,
+        models.Product.status: case((models.Product.stock == quantity, 'sold'), else_=models.Product.status),
+    }, synchronize_session=False))
+
+
+def _reject(db: Session, product_id: int, quantity: int):
+    # Slow path: work out why the conditional update matched nothing
+    product = db.query(models.Product).filter(models.Product.id == product_id).first()
+    if not product:
+        raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
+    if product.listing_type != 'direct':
+        raise HTTPException(status_code=400, detail=f"{product.title} is not a direct purchase item")
+    if product.status != 'active' or product.stock < 1:
+        raise HTTPException(status_code=400, detail=f"{product.title} is not available")
+    raise HTTPException(status_code=400, detail=f"Only {product.stock} of {product.title} left in stock")
+
+
+def checkout(db: Session, buyer_id: int, quantities: Dict[int, int]) -> List[dict]:
+    """Buys every product in `quantities` (product id -> units) or none of them, and commits.
+
+    Returns one receipt line per product (transaction id, product, quantity, total).
+
+    Products are updated in id order, and the dashboard rows in key order
+    (see dashboard.record_sales), so two carts sharing products or sellers
+    lock their rows in the same order and cannot deadlock on Postgres.
+    """
+    for product_id in sorted(quantities):
+        if not _take_stock(db, product_id, quantities[product_id]):
+            db.rollback()
+            _reject(db, product_id, quantities[product_id])
+
+    # The rows are ours until commit: read what the transactions need in one query
+    products = db.query(models.Product.id, models.Product.seller_id, models.Product.price) \
+        .filter(models.Product.id.in_(quantities)).all()
+    transactions = []
+    for product_id, seller_id, price in sorted(products):
+        quantity = quantities[product_id]
+        total_amount = price * quantity
+        commission_amount = total_amount * bidding.COMMISSION_RATE
+        transaction = models.Transaction(
+            product_id=product_id,
+            buyer_id=buyer_id,
+            seller_id=seller_id,
+            quantity=quantity,
+            total_amount=total_amount,
+            commission_rate=bidding.COMMISSION_RATE,
+            commission_amount=commission_amount,
+            net_seller_amount=total_amount - commission_amount,
+            status="completed" # Assuming instant payment for now
+        )
+        db.add(transaction)
+        transactions.append(transaction)
+    dashboard.record_sales(db, transactions)
+    # Assign ids now, so the receipt doesn't reload every row after the commit
+    db.flush()
+    receipt = [{"transaction_id": t.id, "product_id": t.product_id, "quantity": t.quantity,
+                "total_amount": t.total_amount} for t in transactions]
+    db.commit()
+    return receipt
@@ -0,0 +1,189 @@
+import asyncio
+import json
+import os
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+
+from fastapi import WebSocket
+
+# How long a single socket may take to accept a message before we drop it.
+# A slow client must never hold up the rest of the room.
+SEND_TIMEOUT_SECONDS = 5.0
+# Sockets in snapshot mode get at most one message per interval during a bidding war
+WS_SNAPSHOT_INTERVAL = float(os.getenv("WS_SNAPSHOT_INTERVAL", "1.0"))
+# Bids carried by one snapshot; older ones are flagged as truncated
+WS_SNAPSHOT_MAX_BIDS = int(os.getenv("WS_SNAPSHOT_MAX_BIDS", "50"))
+
+
+def snapshot_message(product_id: int, bids: List[dict], current_highest_bid: float,
+                     highest_bidder_username: Optional[str], truncated: bool = False, **extra) -> str:
+    """A coalesced update: the latest price and leader plus the bids (newest first) since the last one.
+
+    `seq` is the id of the newest bid. Bid ids grow with every accepted bid on
+    an auction, so a client that reconnects with ?since=<seq> is sent only
+    what it missed.
+    """
+    message = {
+        "type": "snapshot",
+        "product_id": product_id,
+        "seq": bids[0]["id"] if bids else None,
+        "current_highest_bid": current_highest_bid,
+        "highest_bidder_username": highest_bidder_username,
+        "bids": bids,
+        "truncated": truncated,
+    }
+    message.update(extra)
+    return json.dumps(message)
+
+
+class SnapshotBuffer:
+    """new_bid events received for a room since its last snapshot."""
+
+    def __init__(self):
+        self.bids: List[dict] = []
+        self.truncated = False
+        self.handle: Optional[asyncio.TimerHandle] = None
+
+    def add(self, event: dict):
+        self.bids.insert(0, {
+            "id": event["bid_id"],
+            "product_id": event["product_id"],
+            "user_id": event["user_id"],
+            "username": event["username"],
+            "amount": event["amount"],
+            "timestamp": event["timestamp"],
+        })
+        # Events may arrive slightly out of order; keep the newest (and highest) bid first
+        self.bids.sort(key=lambda bid: bid["id"], reverse=True)
+        if len(self.bids) > WS_SNAPSHOT_MAX_BIDS:
+            self.bids.pop()
+            self.truncated = True
+
+
+class ConnectionManager:
+    """Tracks live WebSocket viewers grouped into one room per product.
+
+    Sockets receive every event as it happens, or, in snapshot mode, bursts of
+    bids coalesced into one snapshot per interval. A socket can be held while
+    its missed events are sent; live events for it are queued meanwhile.
+    """
+
+    def __init__(self, send_timeout: float = SEND_TIMEOUT_SECONDS, snapshot_interval: float = WS_SNAPSHOT_INTERVAL):
+        self.rooms: Dict[int, Set[WebSocket]] = defaultdict(set)
+        self.send_timeout = send_timeout
+        self.snapshot_interval = snapshot_interval
+        self.throttled: Set[WebSocket] = set()
+        self.held: Dict[WebSocket, List[str]] = {}
+        self.buffers: Dict[int, SnapshotBuffer] = {}
+
+    async def connect(self, websocket: WebSocket, product_id: int, throttled: bool = False, hold: bool = False):
+        await websocket.accept()
+        if throttled:
+            self.throttled.add(websocket)
+        if hold:
+            self.held[websocket] = []
+        self.rooms[product_id].add(websocket)
+
+    async def release(self, websocket: WebSocket, product_id: int):
+        """Stops holding a socket and sends it the events queued while it was held."""
+        queued = self.held.pop(websocket, None)
+        for message in queued or []:
+            if not await self._send(websocket, message):
+                self._drop(websocket, product_id)
+                return
+
+    def disconnect(self, websocket: WebSocket, product_id: int):
+        self.throttled.discard(websocket)
+        self.held.pop(websocket, None)
+        room = self.rooms.get(product_id)
+        if room is None:
+            return
+        room.discard(websocket)
+        if not room:
+            del self.rooms[product_id]
+            buffer = self.buffers.pop(product_id, None)
+            if buffer is not None and buffer.handle is not None:
+                buffer.handle.cancel()
+
+    def _drop(self, websocket: WebSocket, product_id: int):
+        # Dead or too slow - drop it so it cannot stall the next broadcast
+        self.disconnect(websocket, product_id)
+        asyncio.ensure_future(self._close(websocket))
+
+    async def _send(self, websocket: WebSocket, message: str) -> bool:
+        try:
+            await asyncio.wait_for(websocket.send_text(message), timeout=self.send_timeout)
+            return True
+        except Exception:
+            return False
+
+    async def _close(self, websocket: WebSocket):
+        try:
+            await asyncio.wait_for(websocket.close(), timeout=self.send_timeout)
+        except Exception:
+            pass
+
+    async def _send_all(self, product_id: int, targets: List[WebSocket], message: str):
+        results = await asyncio.gather(*(self._send(ws, message) for ws in targets))
+        for websocket, delivered in zip(targets, results):
+            if not delivered:
+                self._drop(websocket, product_id)
+
+    async def broadcast(self, product_id: int, message: str):
+        room = self.rooms.get(product_id)
+        if not room:
+            return
+        # Snapshot the room: sockets may join or leave while we are awaiting
+        live, throttled = [], False
+        for websocket in room:
+            if websocket in self.held:
+                self.held[websocket].append(message)
+            elif websocket in self.throttled:
+                throttled = True
+            else:
+                live.append(websocket)
+        if throttled:
+            await self._coalesce(product_id, message)
+        await self._send_all(product_id, live, message)
+
+    async def _coalesce(self, product_id: int, message: str):
+        try:
+            event = json.loads(message)
+        except ValueError:
+            event = None
+        if not isinstance(event, dict) or event.get("type") != "new_bid" or "bid_id" not in event:
+            # Anything but a bid (e.g. auction_closed) goes out at once, after the bids before it
+            await self._flush(product_id)
+            await self._send_all(product_id, self._throttled_targets(product_id), message)
+            return
+        buffer = self.buffers.get(product_id)
+        if buffer is None:
+            buffer = self.buffers[product_id] = SnapshotBuffer()
+        buffer.add(event)
+        if buffer.handle is None:
+            buffer.handle = asyncio.get_running_loop().call_later(
+                self.snapshot_interval, lambda: asyncio.ensure_future(self._flush(product_id)))
+
+    def _throttled_targets(self, product_id: int) -> List[WebSocket]:
+        return [ws for ws in self.rooms.get(product_id, ()) if ws in self.throttled and ws not in self.held]
+
+    async def _flush(self, product_id: int):
+        buffer = self.buffers.pop(product_id, None)
+        if buffer is None:
+            return
+        if buffer.handle is not None:
+            buffer.handle.cancel()
+        leader = buffer.bids[0]
+        message = snapshot_message(product_id, buffer.bids, leader["amount"], leader["username"], buffer.truncated)
+        await self._send_all(product_id, self._throttled_targets(product_id), message)
+
+    def room_counts(self) -> Dict[int, int]:
+        return {product_id: len(room) for product_id, room in self.rooms.items()}
+
+    @property
+    def total_connections(self) -> int:
+        return sum(len(room) for room in self.rooms.values())
+
+    @property
+    def throttled_connections(self) -> int:
+        return len(self.throttled)
@@ -0,0 +1,156 @@
+import asyncio
+import heapq
+import json
+import logging
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import AsyncContextManager, Awaitable, Callable, Iterable, List, Optional, Set, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+import bidding
+import database
+import models
+
+logger = logging.getLogger(__name__)
+
+AUCTION_SCHEDULER_ENABLED = os.getenv("AUCTION_SCHEDULER_ENABLED", "true").lower() == "true"
+# Auctions closed per transaction when many share a deadline
+AUCTION_CLOSE_BATCH = int(os.getenv("AUCTION_CLOSE_BATCH", "100"))
+# How often to pick up auctions created on other workers/instances
+AUCTION_RESYNC_SECONDS = float(os.getenv("AUCTION_RESYNC_SECONDS", "60"))
+# Delay before retrying a batch that failed to close
+RETRY_SECONDS = 5.0
+
+
+def _utc_naive(value: datetime) -> datetime:
+    # end_time is stored as naive UTC
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+@asynccontextmanager
+async def _no_hold(product_ids: Iterable[int]):
+    yield
+
+
+class AuctionScheduler:
+    """Closes auctions at their end_time from a min-heap of deadlines.
+
+    The heap is filled from the (status, end_time) index at startup, topped up
+    by schedule() when an auction is created here, and resynced periodically
+    with auctions ending soon, so ones created on other workers are picked up.
+    Closing is idempotent (see bidding.settle_auction), so several workers may
+    hold the same deadline and only one of them settles it.
+    """
+
+    def __init__(self, publish: Callable[[int, str], Awaitable[None]],
+                 hold: Callable[[Iterable[int]], AsyncContextManager] = _no_hold):
+        self.publish = publish
+        # Wraps each close, e.g. to write out bids still queued for these auctions
+        self.hold = hold
+        self.heap: List[Tuple[datetime, int]] = []
+        self.scheduled: Set[int] = set()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.wake: Optional[asyncio.Event] = None
+        self.task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.wake = asyncio.Event()
+        for end_time, product_id in await run_in_threadpool(self._load_pending, None):
+            self._push(end_time, product_id)
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def schedule(self, product_id: int, end_time: datetime):
+        """Registers a new auction deadline. Safe to call from threadpool endpoints."""
+        if self.loop is None or end_time is None:
+            return
+        self.loop.call_soon_threadsafe(self._push, _utc_naive(end_time), product_id)
+
+    def _push(self, end_time: datetime, product_id: int):
+        if product_id in self.scheduled:
+            return
+        self.scheduled.add(product_id)
+        heapq.heappush(self.heap, (end_time, product_id))
+        # Wake the loop in case this deadline is earlier than the one it sleeps on
+        self.wake.set()
+
+    def _load_pending(self, horizon: Optional[datetime]) -> List[Tuple[datetime, int]]:
+        db = database.SessionLocal()
+        try:
+            query = db.query(models.Product.end_time, models.Product.id).filter(
+                models.Product.status == 'active',
+                models.Product.listing_type == 'auction',
+                models.Product.end_time.isnot(None),
+            )
+            if horizon is not None:
+                query = query.filter(models.Product.end_time <= horizon)
+            return query.all()
+        finally:
+            db.close()
+
+    def _close(self, product_ids: List[int], now: datetime) -> List[dict]:
+        db = database.SessionLocal()
+        try:
+            return bidding.close_expired_auctions(db, product_ids, now)
+        finally:
+            db.close()
+
+    async def _run(self):
+        next_resync = datetime.utcnow() + timedelta(seconds=AUCTION_RESYNC_SECONDS)
+        while True:
+            now = datetime.utcnow()
+            if now >= next_resync:
+                horizon = now + timedelta(seconds=AUCTION_RESYNC_SECONDS * 2)
+                try:
+                    for end_time, product_id in await run_in_threadpool(self._load_pending, horizon):
+                        self._push(end_time, product_id)
+                except Exception:
+                    logger.exception("Auction scheduler resync failed")
+                next_resync = now + timedelta(seconds=AUCTION_RESYNC_SECONDS)
+
+            due = []
+            while self.heap and self.heap[0][0] <= now and len(due) < AUCTION_CLOSE_BATCH:
+                end_time, product_id = heapq.heappop(self.heap)
+                self.scheduled.discard(product_id)
+                due.append(product_id)
+            if due:
+                await self._close_batch(due, now)
+                continue
+
+            wait = (next_resync - now).total_seconds()
+            if self.heap:
+                wait = min(wait, (self.heap[0][0] - now).total_seconds())
+            self.wake.clear()
+            try:
+                await asyncio.wait_for(self.wake.wait(), timeout=max(wait, 0))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _close_batch(self, product_ids: List[int], now: datetime):
+        try:
+            async with self.hold(product_ids):
+                events = await run_in_threadpool(self._close, product_ids, now)
+        except Exception:
+            logger.exception("Closing auctions %s failed, will retry", product_ids)
+            retry_at = now + timedelta(seconds=RETRY_SECONDS)
+            for product_id in product_ids:
+                self._push(retry_at, product_id)
+            return
+        for event in events:
+            try:
+                await self.publish(event["product_id"], json.dumps(event))
+            except Exception:
+                logger.exception("Publishing auction_closed for %s failed", event["product_id"])
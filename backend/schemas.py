@@ -1,7 +1,9 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field, computed_field
+from typing import Generic, Optional, List, TypeVar
 from datetime import datetime
 
+import images
+
 # --- User Schemas ---
 class UserBase(BaseModel):
     username: str
@@ -51,10 +53,20 @@ class ProductResponse(ProductBase):
     seller_id: int
     status: str
     price: Optional[float]
+    stock: Optional[int] = None # Units left, for direct listings
     current_highest_bid: Optional[float]
     highest_bidder_username: Optional[str] = None # Added for UI display
+    title_highlight: Optional[str] = None # Search results only: HTML-escaped title with <mark> around matches
+    description_snippet: Optional[str] = None # Search results only: matching excerpt of the description
     end_time: Optional[datetime]
     created_at: datetime
+
+    @computed_field
+    @property
+    def thumbnail(self) -> Optional[str]:
+        # Small WebP for listings; None for images that didn't go through /upload
+        return images.variant_url(self.images[0], "thumb") if self.images else None
+
     class Config:
         from_attributes = True
 
@@ -71,3 +83,85 @@ class BidResponse(BaseModel):
     timestamp: datetime
     class Config:
         from_attributes = True
+
+class ProductSummaryMixin(BaseModel):
+    # Dashboard rows carry the product they refer to, selected in the same joined query
+    product_title: str
+    product_images: List[str] = Field(default=[], exclude=True)
+
+    @computed_field
+    @property
+    def product_thumbnail(self) -> Optional[str]:
+        if not self.product_images:
+            return None
+        return images.variant_url(self.product_images[0], "thumb") or self.product_images[0]
+
+class BidHistoryResponse(ProductSummaryMixin, BidResponse):
+    product_status: str # active, sold, ended
+    current_highest_bid: float
+    end_time: Optional[datetime]
+    is_winning: bool # Highest bid on its auction; for a closed auction, the one that won
+
+# --- Transaction Schemas ---
+class TransactionResponse(BaseModel):
+    id: int
+    product_id: int
+    buyer_id: int
+    seller_id: int
+    quantity: int = 1
+    total_amount: float
+    commission_rate: float
+    commission_amount: float
+    net_seller_amount: float
+    status: str
+    created_at: datetime
+    class Config:
+        from_attributes = True
+
+class OrderResponse(ProductSummaryMixin, TransactionResponse):
+    listing_type: str # direct, auction
+    seller_username: str
+
+# --- Purchase Schemas ---
+class PurchaseCreate(BaseModel):
+    quantity: int = Field(1, ge=1)
+
+class CartItem(BaseModel):
+    product_id: int
+    quantity: int = Field(1, ge=1)
+
+class CheckoutCreate(BaseModel):
+    items: List[CartItem] = Field(min_length=1, max_length=50)
+
+class ReceiptLine(BaseModel):
+    transaction_id: int
+    product_id: int
+    quantity: int
+    total_amount: float
+
+class CheckoutResponse(BaseModel):
+    message: str
+    total_amount: float
+    items: List[ReceiptLine]
+
+# --- Dashboard Schemas ---
+class SalesTotals(BaseModel):
+    sales_count: int
+    gross_amount: float
+    commission_amount: float
+    net_amount: float # What the seller receives after commission
+
+class DashboardSummary(BaseModel):
+    active_bids: int # Active auctions the user has bid on
+    winning_bids: int # ...where they are currently the highest bidder
+    orders_count: int
+    total_spent: float
+    sales: SalesTotals # All-time, as seller
+    sales_this_month: SalesTotals # Calendar month, UTC
+
+# --- Pagination ---
+T = TypeVar("T")
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None # Pass back as ?cursor= to get the next page; null on the last page
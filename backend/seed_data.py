@@ -1,14 +1,14 @@
 from sqlalchemy.orm import Session
 from database import SessionLocal, engine
 import models
+import migrate
+import dashboard
 import auth
 from datetime import datetime, timedelta
 import random
 
-# Init DB
-models.Base.metadata.create_all(bind=engine)
-
 def seed():
+    """Adds whatever demo data is missing. Expects a migrated schema, as main provides at startup."""
     db = SessionLocal()
     print("Seeding Database...")
 
@@ -21,10 +21,13 @@ def seed():
     ]
 
     db_users = {}
+    # Same password for every demo user: hashed once, and only if one of them is missing
+    hashed_pw = None
     for u in users:
         existing = db.query(models.User).filter(models.User.email == u["email"]).first()
         if not existing:
-            hashed_pw = auth.get_password_hash("password123")
+            if hashed_pw is None:
+                hashed_pw = auth.get_password_hash("password123")
             new_user = models.User(
                 username=u["username"],
                 email=u["email"],
@@ -117,6 +120,8 @@ def seed():
                 timestamp=datetime.utcnow() - timedelta(hours=random.randint(5, 10))
             )
             db.add(bid1)
+            # Written directly, not through bidding.place_bid: keep the dashboard totals in step
+            dashboard.record_bid(db, new_prod.id, bid1.user_id, None)
             
             # Bidder 2 (Higher)
             bid2_amount = bid1_amount + p["min_bid_increment"] * 2
@@ -127,6 +132,7 @@ def seed():
                 timestamp=datetime.utcnow() - timedelta(hours=random.randint(1, 4))
             )
             db.add(bid2)
+            dashboard.record_bid(db, new_prod.id, bid2.user_id, bid1.user_id)
 
             # Update Product
             new_prod.current_highest_bid = bid2_amount
@@ -140,4 +146,5 @@ def seed():
     db.close()
 
 if __name__ == "__main__":
+    migrate.upgrade()
     seed()
@@ -0,0 +1,41 @@
+from functools import lru_cache
+from typing import Any, Iterable, List, Optional
+
+from fastapi.responses import Response
+from pydantic import BaseModel, TypeAdapter
+
+import models
+import schemas
+
+
+def columns_for(model, schema) -> list:
+    """The model's columns that `schema` reads, to select instead of whole ORM objects."""
+    table_columns = model.__table__.columns
+    return [getattr(model, name) for name in schema.model_fields if name in table_columns]
+
+
+# Column lists for the list endpoints: rows come back as plain tuples, no ORM identity map or hydration
+PRODUCT_COLUMNS = columns_for(models.Product, schemas.ProductResponse)
+BID_COLUMNS = columns_for(models.Bid, schemas.BidResponse)
+TRANSACTION_COLUMNS = columns_for(models.Transaction, schemas.TransactionResponse)
+# What dashboard rows show about their product; join models.Product to select them
+PRODUCT_SUMMARY_COLUMNS = [models.Product.title.label("product_title"), models.Product.images.label("product_images")]
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(schema) -> TypeAdapter:
+    return TypeAdapter(List[schema])
+
+
+def page_response(schema, items: Iterable[Any], next_cursor: Optional[str]) -> Response:
+    """Validates `items` (column rows or dicts) once and encodes the page as JSON.
+
+    Returning a Response skips FastAPI's own pass over the response_model,
+    which would validate every item a second time; the route's
+    response_model is still what the OpenAPI docs show.
+    """
+    # Validating dicts is several times faster than reading attributes off Row objects
+    items = [item if isinstance(item, dict) else dict(item._mapping) for item in items]
+    validated: List[BaseModel] = _list_adapter(schema).validate_python(items)
+    page = schemas.Page[schema].model_construct(items=validated, next_cursor=next_cursor)
+    return Response(content=page.model_dump_json(), media_type="application/json")
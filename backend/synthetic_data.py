@@ -0,0 +1,285 @@
+"""Generates a production-sized synthetic dataset for local testing.
+
+Run from backend/:
+
+    python synthetic_data.py --users 100000 --products 200000 --bids 1000000 [--seed 42]
+
+Rows are appended to the database in DATABASE_URL (SQLite by default) in
+batched transactions: multi-row INSERTs on SQLite, COPY on Postgres. Every
+user shares one pre-computed bcrypt hash of "password123", and the emails
+follow user<id>@synthetic.test, so any of them can log in.
+
+The distributions are skewed the way a live marketplace is: categories
+follow a long tail, and bids are spread across auctions by a power law, so a
+few hot auctions collect most of them. Older listings are closed (sold
+items get a Transaction), recent ones are active.
+"""
+import argparse
+import bisect
+import csv
+import io
+import itertools
+import json
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import func, select, text
+
+import bidding
+import dashboard
+import database
+import fulltext
+import hashing
+import migrate
+import models
+
+PASSWORD = "password123"
+BATCH_SIZE = 10000
+# Every tenth synthetic user is an (approved) seller
+SELLER_EVERY = 10
+AUCTION_SHARE = 0.6
+# Listings older than this are closed
+HISTORY_DAYS = 90
+ACTIVE_DAYS = 14
+
+CATEGORIES = ["Antiques", "Coins", "Stamps", "Watches", "Electronics", "Art", "Books", "Cameras",
+              "Jewellery", "Pottery", "Textiles", "Maps", "Toys", "Records", "Posters", "Furniture"]
+# Long tail: the n-th category is 1/n^1.1 as popular as the first, followed by many niche ones
+CATEGORIES += [f"Collectibles {n}" for n in range(1, 65)]
+CATEGORY_WEIGHTS = list(itertools.accumulate(1 / (rank ** 1.1) for rank in range(1, len(CATEGORIES) + 1)))
+
+ADJECTIVES = ["Vintage", "Rare", "Antique", "Classic", "Limited", "Original", "Signed", "Restored",
+              "Mint", "Handmade", "Royal", "Colonial", "Mughal", "Victorian", "Art Deco", "Brass"]
+NOUNS = ["Coin", "Stamp", "Watch", "Camera", "Sword", "Painting", "Map", "Vase", "Radio", "Lamp",
+         "Manuscript", "Medal", "Clock", "Mirror", "Chess Set", "Typewriter", "Poster", "Record"]
+DETAILS = ["in working condition", "with original box", "from a private collection", "with certificate",
+           "minor wear", "fully restored", "museum quality", "rare variant", "early edition", "hand engraved"]
+
+
+def email(user_id: int) -> str:
+    return f"user{user_id}@synthetic.test"
+
+
+def is_seller(user_id: int) -> bool:
+    return user_id % SELLER_EVERY == 0
+
+
+# --- Writing ---
+
+def _csv_value(value):
+    if value is None:
+        return r"\N"
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+
+def _insert(conn, table, rows: List[dict]):
+    if not rows:
+        return
+    if conn.dialect.name != "postgresql":
+        conn.execute(table.insert(), rows)
+        return
+    # COPY streams the batch in one round trip and skips per-row INSERT parsing
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_csv_value(row[c]) for c in columns])
+    buffer.seek(0)
+    cursor = conn.connection.cursor()
+    cursor.copy_expert(
+        f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+    cursor.close()
+
+
+def _next_id(conn, model) -> int:
+    return (conn.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def _reset_sequences(conn):
+    # Rows were written with explicit ids; move the serial sequences past them
+    for table in ("users", "products", "bids", "transactions"):
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 1))"))
+
+
+# --- Generating ---
+
+def _users(first_id: int, count: int, hashed: str, now: datetime):
+    for user_id in range(first_id, first_id + count):
+        yield {
+            "id": user_id,
+            "username": f"user{user_id}",
+            "email": email(user_id),
+            "hashed_password": hashed,
+            "role": "seller" if is_seller(user_id) else "buyer",
+            "is_approved": True,
+            "created_at": now - timedelta(days=HISTORY_DAYS * 2),
+        }
+
+
+def _bid_counts(rng: random.Random, auctions: int, bids: int) -> Counter:
+    """How many bids each auction (by index) gets: a power law over a shuffled order."""
+    if not auctions or not bids:
+        return Counter()
+    order = list(range(auctions))
+    rng.shuffle(order)
+    weights = list(itertools.accumulate(1 / ((rank + 1) ** 1.2) for rank in range(auctions)))
+    return Counter(order[bisect.bisect(weights, rng.random() * weights[-1])] for _ in range(bids))
+
+
+def generate(users: int, products: int, bids: int, seed: int = None, batch_size: int = BATCH_SIZE,
+             engine=None, log=print) -> Dict[str, int]:
+    """Appends synthetic users, products, bids and transactions; returns the first id and count of each."""
+    engine = engine or database.engine
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    started = time.perf_counter()
+
+    with engine.begin() as conn:
+        first = {name: _next_id(conn, model) for name, model in
+                 (("user", models.User), ("product", models.Product), ("bid", models.Bid), ("transaction", models.Transaction))}
+    if users < SELLER_EVERY:
+        raise ValueError(f"Need at least {SELLER_EVERY} users to have a seller")
+
+    # One hash for everyone: bcrypt is deliberately slow, hashing 100k passwords would take hours
+    hashed = hashing.pwd_context.hash(PASSWORD)
+    user_rows = _users(first["user"], users, hashed, now)
+    while True:
+        batch = list(itertools.islice(user_rows, batch_size))
+        if not batch:
+            break
+        with engine.begin() as conn:
+            _insert(conn, models.User.__table__, batch)
+    user_ids = range(first["user"], first["user"] + users)
+    seller_ids = [u for u in user_ids if is_seller(u)]
+    buyer_ids = [u for u in user_ids if not is_seller(u)]
+    log(f"users: {users} in {time.perf_counter() - started:.1f}s")
+
+    kinds = [rng.random() < AUCTION_SHARE for _ in range(products)]
+    bid_counts = _bid_counts(rng, sum(kinds), bids)
+    counts = {"products": 0, "bids": 0, "transactions": 0}
+    product_id, bid_id, transaction_id = first["product"], first["bid"], first["transaction"]
+    auction_index = 0
+    product_batch, bid_batch, transaction_batch = [], [], []
+
+    def flush():
+        with engine.begin() as conn:
+            # Parents first: bids and transactions reference the products
+            _insert(conn, models.Product.__table__, product_batch)
+            _insert(conn, models.Bid.__table__, bid_batch)
+            _insert(conn, models.Transaction.__table__, transaction_batch)
+        counts["products"] += len(product_batch)
+        counts["bids"] += len(bid_batch)
+        counts["transactions"] += len(transaction_batch)
+        product_batch.clear()
+        bid_batch.clear()
+        transaction_batch.clear()
+
+    for auction in kinds:
+        created_at = now - timedelta(seconds=rng.uniform(0, HISTORY_DAYS * 86400))
+        seller_id = rng.choice(seller_ids)
+        # Prices are log-normal: mostly modest, a few very expensive pieces
+        price = round(min(rng.lognormvariate(6, 1.2), 5_000_000), 2)
+        row = {
+            "id": product_id,
+            "seller_id": seller_id,
+            "title": f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} #{product_id}",
+            "description": " ".join(rng.sample(DETAILS, 3)).capitalize() + ".",
+            "category": CATEGORIES[bisect.bisect(CATEGORY_WEIGHTS, rng.random() * CATEGORY_WEIGHTS[-1])],
+            "images": [],
+            "listing_type": "auction" if auction else "direct",
+            "status": "active",
+            "price": None if auction else price,
+            "stock": 1,
+            "start_bid": price if auction else None,
+            "min_bid_increment": max(1.0, round(price * 0.01)),
+            "current_highest_bid": price if auction else 0.0,
+            "end_time": None,
+            "created_at": created_at,
+        }
+        closed = now - created_at > timedelta(days=ACTIVE_DAYS)
+        winner = None
+        if auction:
+            end_time = created_at + timedelta(days=rng.randint(1, ACTIVE_DAYS))
+            if not closed:
+                end_time = max(end_time, now + timedelta(hours=rng.randint(1, 72)))
+            row["end_time"] = end_time
+            amount = price
+            count = bid_counts.get(auction_index, 0)
+            window = (min(end_time, now) - created_at).total_seconds()
+            for offset in sorted(rng.uniform(0, window) for _ in range(count)):
+                amount = round(amount + row["min_bid_increment"] * rng.randint(1, 5), 2)
+                winner = rng.choice(buyer_ids)
+                bid_batch.append({"id": bid_id, "product_id": product_id, "user_id": winner, "amount": amount,
+                                  "timestamp": created_at + timedelta(seconds=offset)})
+                bid_id += 1
+            row["current_highest_bid"] = amount
+            auction_index += 1
+            if closed:
+                row["status"] = "sold" if winner else "ended"
+        elif closed and rng.random() < 0.5:
+            row["status"] = "sold"
+            row["stock"] = 0
+            winner = rng.choice(buyer_ids)
+
+        if row["status"] == "sold":
+            total = row["current_highest_bid"] if auction else price
+            commission = total * bidding.COMMISSION_RATE
+            transaction_batch.append({
+                "id": transaction_id, "product_id": product_id, "buyer_id": winner, "seller_id": seller_id,
+                "total_amount": total, "commission_rate": bidding.COMMISSION_RATE, "commission_amount": commission,
+                "net_seller_amount": total - commission, "status": "completed",
+                "created_at": row["end_time"] or created_at + timedelta(days=rng.randint(1, ACTIVE_DAYS)),
+            })
+            transaction_id += 1
+        product_batch.append(row)
+        product_id += 1
+        if len(product_batch) >= batch_size or len(bid_batch) >= batch_size * 5:
+            flush()
+    flush()
+
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            _reset_sequences(conn)
+    log(f"products: {counts['products']}, bids: {counts['bids']}, transactions: {counts['transactions']} "
+        f"in {time.perf_counter() - started:.1f}s")
+    return {
+        "first_user_id": first["user"], "users": users,
+        "first_product_id": first["product"], "products": counts["products"],
+        "bids": counts["bids"], "transactions": counts["transactions"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--bids", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=None, help="Random seed, for a reproducible dataset")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    migrate.upgrade()
+    generate(args.users, args.products, args.bids, seed=args.seed, batch_size=args.batch_size)
+    # The rows bypassed the API, so the dashboard totals are recomputed from them
+    db = database.SessionLocal()
+    try:
+        print(f"dashboard aggregates: {dashboard.rebuild(db)}")
+        db.commit()
+    finally:
+        db.close()
+    # Creates the search index if the API has never run against this database
+    fulltext.setup(database.engine)
+
+
+if __name__ == "__main__":
+    main()
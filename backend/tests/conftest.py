@@ -0,0 +1,58 @@
+"""Tests run against a scratch SQLite database, configured before any backend module is imported.
+
+Run from the repository root or backend/:
+
+    python -m pytest backend/tests -q
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+SCRATCH = tempfile.mkdtemp(prefix="vortex-tests-")
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL", f"sqlite:///{os.path.join(SCRATCH, 'test.db')}")
+# main.py serves static/ and stores uploads relative to the working directory
+os.chdir(SCRATCH)
+
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import database  # noqa: E402
+import models  # noqa: E402
+
+
+@pytest.fixture
+def scratch_session(tmp_path):
+    """A sessionmaker on an empty database of its own, for tests that don't need the app."""
+    engine = database.create_db_engine(f"sqlite:///{tmp_path / 'scratch.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine, autoflush=False)
+    engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def client():
+    """The app on the scratch database, seeded with seed_data (see its users and listings)."""
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as test_client:
+        test_client.post("/seed")
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def login(client):
+    tokens = {}
+
+    def headers(email: str) -> dict:
+        if email not in tokens:
+            response = client.post("/auth/login", json={"email": email, "password": "password123"})
+            tokens[email] = response.json()["access_token"]
+        return {"Authorization": f"Bearer {tokens[email]}"}
+
+    return headers
@@ -0,0 +1,141 @@
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+import database
+import main
+import models
+
+SELLER = "king@vortex.com"
+BUYER = "buff@vortex.com"
+
+
+def _seller_auction(client) -> dict:
+    products = client.get("/products").json()["items"]
+    return next(p for p in products if p["listing_type"] == "auction" and p["status"] == "active" and p["seller_id"] == 1)
+
+
+def test_close_auction_checks_ownership_before_holding_bids(client, login, monkeypatch):
+    held = []
+
+    @asynccontextmanager
+    async def hold(product_ids):
+        held.append(list(product_ids))
+        yield
+
+    monkeypatch.setattr(main.bid_writer, "hold", hold)
+    auction = _seller_auction(client)
+
+    response = client.post(f"/products/{auction['id']}/close_auction", headers=login(BUYER))
+    assert response.status_code == 403
+    assert held == []
+
+    response = client.post(f"/products/{auction['id']}/close_auction", headers=login(SELLER))
+    assert response.status_code == 200
+    assert held == [[auction["id"]]]
+
+
+def test_seed_does_not_rebuild_dashboard_aggregates(client, monkeypatch):
+    import dashboard
+
+    def no_rebuild(db):
+        raise AssertionError("/seed must not rebuild the aggregates")
+
+    monkeypatch.setattr(dashboard, "rebuild", no_rebuild)
+    assert client.post("/seed").status_code == 200
+
+
+def test_seed_hashes_nothing_when_the_users_exist(client, monkeypatch):
+    import auth
+
+    def no_hash(password):
+        raise AssertionError("/seed must not hash a password for existing users")
+
+    monkeypatch.setattr(auth, "get_password_hash", no_hash)
+    assert client.post("/seed").status_code == 200
+
+
+def test_websocket_ping_is_answered_only_to_the_sender(client, login):
+    auction = _seller_auction(client)
+    path = f"/ws/bids/{auction['id']}"
+    with client.websocket_connect(path) as sender, client.websocket_connect(f"{path}?mode=snapshot") as viewer:
+        sender.send_text("ping")
+        assert sender.receive_json() == {"type": "pong"}
+        assert main.manager.room_counts()[auction["id"]] == 2
+        # The viewer's next message is the close event, not a rebroadcast ping
+        client.post(f"/products/{auction['id']}/close_auction", headers=login(SELLER))
+        assert viewer.receive_json()["type"] == "auction_closed"
+
+
+def test_tied_bids_page_the_same_from_cache_and_database(client):
+    db = database.SessionLocal()
+    try:
+        auction = models.Product(
+            title="Tied auction", description="test", category="Test", listing_type="auction", status="active",
+            current_highest_bid=50.0, min_bid_increment=0.0, seller_id=1, end_time=datetime.utcnow() + timedelta(days=1),
+        )
+        db.add(auction)
+        db.flush()
+        bids = [models.Bid(product_id=auction.id, user_id=2 + i % 2, amount=50.0 if i < 6 else 40.0) for i in range(9)]
+        db.add_all(bids)
+        db.commit()
+        auction_id = auction.id
+        expected = [b.id for b in sorted(bids, key=lambda b: (-b.amount, b.id))]
+    finally:
+        db.close()
+
+    # The first page comes from the live auction cache, the rest from the database
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 4, **({"cursor": cursor} if cursor else {})}
+        page = client.get(f"/products/{auction_id}/bids", params=params).json()
+        seen += [b["id"] for b in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == expected
+
+
+def test_tied_bid_does_not_take_the_lead_in_the_dashboard(scratch_session, tmp_path):
+    import asyncio
+
+    import bidding
+    import dashboard
+    import write_behind
+
+    Session = scratch_session
+    db = Session()
+    db.add_all([models.User(username=f"user{i}", email=f"user{i}@test", hashed_password="x", role="buyer")
+                for i in range(3)])
+    db.add_all([models.Product(
+        title=f"No increment {i}", description="test", category="Test", listing_type="auction", status="active",
+        current_highest_bid=50.0, min_bid_increment=0.0, seller_id=1, end_time=datetime.utcnow() + timedelta(days=1),
+    ) for i in range(2)])
+    db.commit()
+    bidding.place_bid(db, 1, 2, 60.0)
+    bidding.place_bid(db, 1, 3, 60.0)
+    db.close()
+
+    async def write_behind_ties():
+        log = write_behind.WriteBehindBidLog(Session, str(tmp_path / "bid_journal.log"))
+        await log.start()
+        await log.place(2, 2, 60.0)
+        await log.place(2, 3, 60.0)
+        await log.stop()
+
+    asyncio.run(write_behind_ties())
+
+    db = Session()
+    try:
+        incremental = {row.user_id: (row.active_bids, row.winning_bids) for row in db.query(models.BuyerStats)}
+        dashboard.rebuild(db)
+        rebuilt = {row.user_id: (row.active_bids, row.winning_bids) for row in db.query(models.BuyerStats)}
+    finally:
+        db.rollback()
+        db.close()
+    # The earlier bid keeps the lead of both auctions
+    assert incremental == rebuilt == {2: (2, 2), 3: (2, 0)}
+
+
+def test_search_without_terms_does_not_return_the_catalogue(client):
+    assert client.get("/products", params={"search": "!!!"}).json()["items"] == []
+    assert client.get("/products", params={"search": "Mughal"}).json()["items"]
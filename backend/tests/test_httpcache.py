@@ -0,0 +1,13 @@
+import httpcache
+
+
+def test_evicted_product_version_does_not_revive_stale_entries():
+    cache = httpcache.ResponseCache(maxsize=2, ttl=60)
+    built_at = cache.version(1)
+    cache.invalidate(1)
+    # Other products push product 1's version out of the LRU
+    for product_id in range(2, 10):
+        cache.invalidate(product_id)
+    assert len(cache.product_versions) == 2
+    assert cache.version(1) != built_at
+    assert cache.version(1) == cache.version(1)
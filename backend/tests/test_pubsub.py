@@ -0,0 +1,74 @@
+import asyncio
+import os
+
+import pytest
+
+import pubsub
+
+# A local Postgres the tests may LISTEN/NOTIFY on; the Postgres bus tests are skipped without one
+POSTGRES_URL = os.getenv("TEST_POSTGRES_URL", "postgresql://localhost/postgres")
+
+
+def test_memory_bus_publish_does_not_raise_when_delivery_fails():
+    async def failing(product_id, message):
+        raise RuntimeError("socket gone")
+
+    async def scenario():
+        bus = pubsub.InProcessEventBus()
+        await bus.start(failing)
+        await bus.publish(1, "{}")
+
+    asyncio.run(scenario())
+
+
+@pytest.fixture
+def postgres_dsn():
+    psycopg2 = pytest.importorskip("psycopg2")
+    try:
+        psycopg2.connect(POSTGRES_URL, connect_timeout=2).close()
+    except psycopg2.OperationalError:
+        pytest.skip(f"no Postgres at {POSTGRES_URL}")
+    return POSTGRES_URL
+
+
+def _terminate(dsn, conn):
+    import psycopg2
+
+    admin = psycopg2.connect(dsn)
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        cur.execute("SELECT pg_terminate_backend(%s)", (conn.get_backend_pid(),))
+    admin.close()
+
+
+def test_postgres_bus_survives_dropped_connections(postgres_dsn):
+    async def scenario():
+        received = asyncio.Queue()
+
+        async def handler(product_id, message):
+            await received.put((product_id, message))
+
+        bus = pubsub.PostgresEventBus(postgres_dsn, channel="vortex_bid_events_test")
+        await bus.start(handler)
+        try:
+            await bus.publish(1, "first")
+            assert await asyncio.wait_for(received.get(), 5) == (1, "first")
+
+            # The publishing connection dies on its own: the next publish reconnects it
+            _terminate(postgres_dsn, bus.notify_conn)
+            await bus.publish(2, "after notify reconnect")
+            assert await asyncio.wait_for(received.get(), 5) == (2, "after notify reconnect")
+
+            # The listener dies: it reconnects while publishing carries on
+            dropped = bus.listen_conn
+            _terminate(postgres_dsn, dropped)
+            for _ in range(50):
+                await asyncio.sleep(0.1)
+                if bus.listen_conn is not None and bus.listen_conn is not dropped:
+                    break
+            await bus.publish(3, "after listen reconnect")
+            assert await asyncio.wait_for(received.get(), 5) == (3, "after listen reconnect")
+        finally:
+            await bus.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,83 @@
+"""The list endpoints must issue a fixed number of statements per page, however many rows it returns."""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+import database
+import main
+import models
+
+BUYER = "lover@vortex.com"
+# Page sizes compared: a per-row query would add 45 statements to the larger page
+SMALL, LARGE = 5, 50
+
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(database.engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(database.engine, "before_cursor_execute", capture)
+
+
+def _listings(db):
+    auction = models.Product(
+        title="Counted auction", description="test", category="Test", listing_type="auction", status="active",
+        current_highest_bid=0.0, min_bid_increment=1.0, seller_id=1, end_time=datetime.utcnow() + timedelta(days=1),
+        images=["/static/images/a.jpg"],
+    )
+    direct = models.Product(
+        title="Counted item", description="test", category="Test", listing_type="direct", status="active",
+        price=10.0, stock=1000, seller_id=1, images=["/static/images/b.jpg"],
+    )
+    db.add_all([auction, direct])
+    db.commit()
+    return auction.id, direct.id
+
+
+def _add_rows(db, buyer_id: int, auction_id: int, direct_id: int, count: int):
+    start = db.query(models.Bid).filter(models.Bid.product_id == auction_id).count()
+    for i in range(start, start + count):
+        db.add(models.Bid(product_id=auction_id, user_id=buyer_id, amount=float(i + 1)))
+        db.add(models.Transaction(
+            product_id=direct_id, buyer_id=buyer_id, seller_id=1, quantity=1, total_amount=10.0,
+            commission_rate=0.05, commission_amount=0.5, net_seller_amount=9.5, status="completed",
+        ))
+    db.commit()
+
+
+def _statements(client, headers, url: str, limit: int) -> int:
+    # Measure the database path, not the response and live auction caches
+    main.response_cache.entries.clear()
+    main.live_state.states.clear()
+    separator = "&" if "?" in url else "?"
+    with count_statements() as statements:
+        response = client.get(f"{url}{separator}limit={limit}", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == limit
+    return len(statements)
+
+
+def test_list_endpoints_do_not_grow_with_page_size(client, login):
+    headers = login(BUYER)
+    buyer_id = client.get("/auth/me", headers=headers).json()["id"]
+    db = database.SessionLocal()
+    try:
+        auction_id, direct_id = _listings(db)
+        _add_rows(db, buyer_id, auction_id, direct_id, LARGE + 10)
+    finally:
+        db.close()
+    # The first page of bids comes from the live auction cache; a later one is always a query
+    cursor = client.get(f"/products/{auction_id}/bids?limit=1").json()["next_cursor"]
+    urls = ["/users/me/orders", "/users/me/bids", f"/products/{auction_id}/bids?cursor={cursor}"]
+
+    small = {url: _statements(client, headers, url, SMALL) for url in urls}
+    large = {url: _statements(client, headers, url, LARGE) for url in urls}
+    assert large == small
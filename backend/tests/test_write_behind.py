@@ -0,0 +1,184 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import live_auctions
+import models
+import write_behind
+
+
+def _auctions(Session, count: int) -> list:
+    db = Session()
+    seller = models.User(username="seller", email="seller@test", hashed_password="x", role="seller")
+    bidder = models.User(username="bidder", email="bidder@test", hashed_password="x", role="buyer")
+    db.add_all([seller, bidder])
+    db.flush()
+    products = [models.Product(
+        title=f"Lot {i}", description="test", category="Test", listing_type="auction", status="active",
+        current_highest_bid=100.0, min_bid_increment=10.0, seller_id=seller.id,
+        end_time=datetime.utcnow() + timedelta(days=1),
+    ) for i in range(count)]
+    db.add_all(products)
+    db.commit()
+    product_ids = [product.id for product in products]
+    db.close()
+    return product_ids
+
+
+def _auction(Session) -> int:
+    return _auctions(Session, 1)[0]
+
+
+def _writer(Session, tmp_path, **kwargs) -> write_behind.WriteBehindBidLog:
+    # Long interval: nothing is flushed unless the test asks for it
+    return write_behind.WriteBehindBidLog(Session, str(tmp_path / "bid_journal.log"), interval_ms=60_000, **kwargs)
+
+
+def test_live_cache_load_includes_queued_bids(scratch_session, tmp_path):
+    Session = scratch_session
+    product_id = _auction(Session)
+
+    async def scenario():
+        log = _writer(Session, tmp_path)
+        await log.start()
+        bid = await log.place(product_id, 2, 150.0)
+        db = Session()
+        try:
+            stored = db.query(models.Bid).count()
+            state = live_auctions.LiveAuctionCache(log.pending_bids).load(db, product_id)
+        finally:
+            db.close()
+        await log.stop()
+        return bid, stored, state
+
+    bid, stored, state = asyncio.run(scenario())
+    assert stored == 0
+    assert state.current_highest_bid == 150.0
+    assert state.product.highest_bidder_username == "bidder"
+    assert [b.id for b in state.top_bids] == [bid.id]
+    assert state.bid_count == 1
+
+
+def test_journal_replay_restores_unflushed_bids(scratch_session, tmp_path):
+    Session = scratch_session
+    product_id = _auction(Session)
+
+    async def crash():
+        log = _writer(Session, tmp_path)
+        await log.start()
+        bids = [await log.place(product_id, 2, amount) for amount in (110.0, 120.0, 130.0)]
+        # Process dies: no flush, no stop()
+        log.task.cancel()
+        return bids
+
+    bids = asyncio.run(crash())
+    replay = _writer(Session, tmp_path)
+    assert replay.recover() == 3
+    assert replay.recover() == 0
+
+    db = Session()
+    try:
+        assert sorted(i for (i,) in db.query(models.Bid.id)) == [b.id for b in bids]
+        assert db.get(models.Product, product_id).current_highest_bid == 130.0
+    finally:
+        db.close()
+
+
+def test_rejected_bid_is_set_aside_without_blocking_the_rest(scratch_session, tmp_path):
+    Session = scratch_session
+    product_id = _auction(Session)
+
+    async def scenario():
+        log = _writer(Session, tmp_path)
+        await log.start()
+        # Something else takes the id the writer will give its next bid
+        db = Session()
+        db.add(models.Bid(id=log.next_id, product_id=product_id, user_id=2, amount=105.0))
+        db.commit()
+        db.close()
+        bids = [await log.place(product_id, 2, amount) for amount in (110.0, 120.0, 130.0)]
+        await asyncio.wait_for(log.stop(), timeout=10)
+        return bids, log.snapshot()
+
+    bids, stats = asyncio.run(scenario())
+    assert stats["failed"] == 1
+    db = Session()
+    try:
+        stored = dict(db.query(models.Bid.id, models.Bid.amount))
+    finally:
+        db.close()
+    assert stored[bids[0].id] == 105.0
+    assert stored[bids[1].id] == 120.0 and stored[bids[2].id] == 130.0
+    with open(tmp_path / "bid_journal.log.failed", "rb") as failed:
+        assert [write_behind.PendingBid.from_line(line).amount for line in failed] == [110.0]
+
+
+def test_hold_returns_while_other_auctions_keep_bidding(scratch_session, tmp_path):
+    Session = scratch_session
+    closing, busy = _auctions(Session, 2)
+
+    async def scenario():
+        log = write_behind.WriteBehindBidLog(Session, str(tmp_path / "bid_journal.log"), interval_ms=5)
+        await log.start()
+        stop = asyncio.Event()
+
+        async def bidder():
+            amount = 100.0
+            while not stop.is_set():
+                amount += 10
+                await log.place(busy, 2, amount)
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(bidder())
+        await asyncio.sleep(0.05)
+        held = await log.place(closing, 2, 110.0)
+        try:
+            async with log.hold([closing]):
+                db = Session()
+                try:
+                    stored = db.get(models.Bid, held.id) is not None
+                finally:
+                    db.close()
+                pending = len(log.queue) + len(log.inflight)
+        finally:
+            stop.set()
+            await task
+        await log.stop()
+        return stored, pending
+
+    stored, pending = asyncio.run(asyncio.wait_for(scenario(), timeout=10))
+    assert stored
+    # The other auction was still bidding: the hold did not wait for an empty queue
+    assert pending > 0
+
+
+def test_set_aside_bid_replays_under_a_new_id(scratch_session, tmp_path):
+    Session = scratch_session
+    product_id = _auction(Session)
+
+    async def scenario():
+        log = _writer(Session, tmp_path)
+        await log.start()
+        db = Session()
+        db.add(models.Bid(id=log.next_id, product_id=product_id, user_id=1, amount=105.0))
+        db.commit()
+        db.close()
+        bid = await log.place(product_id, 2, 110.0)
+        await asyncio.wait_for(log.stop(), timeout=10)
+        return bid
+
+    bid = asyncio.run(scenario())
+    # As the README says: rename the file to <journal>.0 and restart
+    failed = (tmp_path / "bid_journal.log.failed").read_bytes()
+    (tmp_path / "bid_journal.log.0").write_bytes(failed)
+    replay = _writer(Session, tmp_path)
+    assert replay.recover() == 1
+    # Killed before the journal was removed: replaying it again writes nothing twice
+    (tmp_path / "bid_journal.log.0").write_bytes(failed)
+    assert replay.recover() == 0
+
+    db = Session()
+    try:
+        stored = sorted((b.id, b.user_id, b.amount) for b in db.query(models.Bid))
+    finally:
+        db.close()
+    assert stored == [(bid.id, 1, 105.0), (bid.id + 1, 2, 110.0)]
@@ -12,8 +12,9 @@ const ProductCard = ({ product }) => {
                 <div className="h-56 bg-slate-950 relative overflow-hidden">
                     {product.images && product.images.length > 0 ? (
                         <img
-                            src={product.images[0]}
+                            src={product.thumbnail || product.images[0]}
                             alt={product.title}
+                            loading="lazy"
                             className="w-full h-full object-cover group-hover:scale-110 transition-transform duration-700 opacity-90 group-hover:opacity-100"
                         />
                     ) : (
@@ -60,12 +61,23 @@ const ProductCard = ({ product }) => {
                         </div>
                     </div>
 
-                    <h3 className="text-xl font-bold text-white mb-2 line-clamp-1 group-hover:text-primary transition-colors">
-                        {product.title}
-                    </h3>
-                    <p className="text-slate-400 text-sm line-clamp-2 mb-4 h-10">
-                        {product.description}
-                    </p>
+                    {/* Search highlights come back HTML-escaped with only <mark> tags added */}
+                    {product.title_highlight ? (
+                        <h3 className="text-xl font-bold text-white mb-2 line-clamp-1 group-hover:text-primary transition-colors"
+                            dangerouslySetInnerHTML={{ __html: product.title_highlight }} />
+                    ) : (
+                        <h3 className="text-xl font-bold text-white mb-2 line-clamp-1 group-hover:text-primary transition-colors">
+                            {product.title}
+                        </h3>
+                    )}
+                    {product.description_snippet ? (
+                        <p className="text-slate-400 text-sm line-clamp-2 mb-4 h-10"
+                            dangerouslySetInnerHTML={{ __html: product.description_snippet }} />
+                    ) : (
+                        <p className="text-slate-400 text-sm line-clamp-2 mb-4 h-10">
+                            {product.description}
+                        </p>
+                    )}
 
                     <div className="flex items-center justify-between text-sm text-slate-500 border-t border-white/5 pt-3">
                         <div className="flex items-center gap-1">
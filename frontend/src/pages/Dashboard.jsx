@@ -1,28 +1,48 @@
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
+import { Link } from 'react-router-dom';
 import { useAuth } from '../context/AuthContext';
 import { Package, Gavel, ShoppingBag } from 'lucide-react';
 
+const SummaryCard = ({ label, value }) => (
+    <div className="bg-slate-900/50 rounded-2xl border border-white/5 p-4">
+        <div className="text-xs uppercase text-slate-400">{label}</div>
+        <div className="text-2xl font-bold text-white mt-1">{value}</div>
+    </div>
+);
+
 const Dashboard = () => {
     const { user } = useAuth();
     const [activeTab, setActiveTab] = useState('orders'); // orders, listings, bids
     const [data, setData] = useState([]);
     const [loading, setLoading] = useState(false);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [summary, setSummary] = useState(null);
+
+    useEffect(() => {
+        // Totals come pre-aggregated from the server, not summed over the loaded rows
+        axios.get('/api/users/me/summary')
+            .then(res => setSummary(res.data))
+            .catch(err => console.error(err));
+    }, []);
 
     useEffect(() => {
+        setData([]);
         fetchData();
     }, [activeTab]);
 
-    const fetchData = async () => {
+    const tabUrl = () => {
+        if (activeTab === 'listings') return '/api/users/me/products';
+        if (activeTab === 'bids') return '/api/users/me/bids';
+        return '/api/users/me/orders';
+    };
+
+    const fetchData = async (cursor = null) => {
         setLoading(true);
         try {
-            let url = '';
-            if (activeTab === 'listings') url = '/api/users/me/products';
-            else if (activeTab === 'bids') url = '/api/users/me/bids';
-            else url = '/api/users/me/orders';
-
-            const res = await axios.get(url);
-            setData(res.data);
+            const res = await axios.get(tabUrl(), { params: cursor ? { cursor } : {} });
+            setData(prev => cursor ? [...prev, ...res.data.items] : res.data.items);
+            setNextCursor(res.data.next_cursor);
         } catch (err) {
             console.error(err);
         } finally {
@@ -34,6 +54,24 @@ const Dashboard = () => {
         <div className="max-w-6xl mx-auto px-4 py-8">
             <h1 className="text-3xl font-bold mb-8">My Dashboard</h1>
 
+            {/* Summary */}
+            {summary && (
+                <div className="grid grid-cols-2 md:grid-cols-4 gap-4 mb-8">
+                    <SummaryCard label="Active Bids" value={summary.active_bids} />
+                    <SummaryCard label="Winning" value={summary.winning_bids} />
+                    <SummaryCard label="Orders" value={summary.orders_count} />
+                    <SummaryCard label="Total Spent" value={`₹${summary.total_spent.toFixed(2)}`} />
+                    {(user?.role === 'seller' || user?.role === 'admin') && (
+                        <>
+                            <SummaryCard label="Revenue This Month" value={`₹${summary.sales_this_month.gross_amount.toFixed(2)}`} />
+                            <SummaryCard label="Sales" value={summary.sales.sales_count} />
+                            <SummaryCard label="Commission" value={`₹${summary.sales.commission_amount.toFixed(2)}`} />
+                            <SummaryCard label="Net Earnings" value={`₹${summary.sales.net_amount.toFixed(2)}`} />
+                        </>
+                    )}
+                </div>
+            )}
+
             {/* Tabs */}
             <div className="flex space-x-4 mb-8 border-b border-white/10 pb-4">
                 <button
@@ -59,7 +97,7 @@ const Dashboard = () => {
             </div>
 
             {/* Content */}
-            {loading ? (
+            {loading && data.length === 0 ? (
                 <div className="text-center py-12 text-slate-500">Loading...</div>
             ) : data.length === 0 ? (
                 <div className="text-center py-12 text-slate-500 bg-slate-900/50 rounded-2xl border border-dashed border-slate-700">
@@ -72,7 +110,7 @@ const Dashboard = () => {
                             <thead className="bg-slate-900 text-slate-400 text-xs uppercase">
                                 <tr>
                                     <th className="px-6 py-4">ID</th>
-                                    {activeTab === 'listings' && <th className="px-6 py-4">Title</th>}
+                                    <th className="px-6 py-4">{activeTab === 'orders' ? 'Item' : 'Title'}</th>
                                     <th className="px-6 py-4">Status</th>
                                     <th className="px-6 py-4">Amount</th>
                                     <th className="px-6 py-4">Date</th>
@@ -83,16 +121,29 @@ const Dashboard = () => {
                                     <tr key={item.id} className="hover:bg-white/5 transition-colors">
                                         <td className="px-6 py-4 font-mono text-slate-500">#{item.id}</td>
 
-                                        {activeTab === 'listings' && (
-                                            <td className="px-6 py-4 font-bold text-white max-w-xs truncate">{item.title}</td>
-                                        )}
+                                        <td className="px-6 py-4 font-bold text-white max-w-xs truncate">
+                                            <Link to={`/product/${item.product_id || item.id}`} className="flex items-center gap-3 hover:underline">
+                                                {item.product_thumbnail && (
+                                                    <img src={item.product_thumbnail} alt="" loading="lazy" className="w-10 h-10 rounded object-cover" />
+                                                )}
+                                                <span className="truncate">{item.title || item.product_title}</span>
+                                            </Link>
+                                            {item.seller_username && (
+                                                <div className="text-xs font-normal text-slate-500">from {item.seller_username}</div>
+                                            )}
+                                        </td>
 
                                         <td className="px-6 py-4">
                                             <span className={`px-2 py-1 rounded text-xs font-bold uppercase 
                                                 ${(item.status === 'completed' || item.status === 'sold') ? 'bg-emerald-500/10 text-emerald-400' :
                                                     item.status === 'pending' ? 'bg-yellow-500/10 text-yellow-500' : 'bg-slate-700 text-slate-300'}`}>
-                                                {item.status || 'Active'}
+                                                {item.status || item.product_status || 'Active'}
                                             </span>
+                                            {activeTab === 'bids' && (
+                                                <span className={`ml-2 text-xs font-bold ${item.is_winning ? 'text-emerald-400' : 'text-slate-500'}`}>
+                                                    {item.is_winning ? (item.product_status === 'active' ? 'Winning' : 'Won') : 'Outbid'}
+                                                </span>
+                                            )}
                                         </td>
 
                                         <td className="px-6 py-4 font-bold">
@@ -107,6 +158,15 @@ const Dashboard = () => {
                             </tbody>
                         </table>
                     </div>
+                    {nextCursor && (
+                        <button
+                            onClick={() => fetchData(nextCursor)}
+                            disabled={loading}
+                            className="w-full py-3 text-sm text-slate-400 hover:text-white border-t border-white/5"
+                        >
+                            {loading ? 'Loading...' : 'Load more'}
+                        </button>
+                    )}
                 </div>
             )}
         </div>
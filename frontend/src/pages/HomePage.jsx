@@ -1,23 +1,30 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import ProductCard from '../components/ProductCard';
 import { Search, Filter, RefreshCw, X } from 'lucide-react';
 
 const HomePage = () => {
     const [products, setProducts] = useState([]);
-    const [filters, setFilters] = useState({ category: '', listing_type: '', min_price: '', max_price: '', search: '' });
+    const [filters, setFilters] = useState({ category: '', listing_type: '', min_price: '', max_price: '', search: '', sort: '' });
     const [loading, setLoading] = useState(true);
+    const [loadingMore, setLoadingMore] = useState(false);
+    const [nextCursor, setNextCursor] = useState(null);
     const [showFilters, setShowFilters] = useState(false);
+    const sentinelRef = useRef(null);
+
+    const buildParams = () => {
+        const params = { ...filters };
+        // Remove empty filters
+        Object.keys(params).forEach(key => !params[key] && delete params[key]);
+        return params;
+    };
 
     const fetchProducts = async () => {
         setLoading(true);
         try {
-            const params = { ...filters };
-            // Remove empty filters
-            Object.keys(params).forEach(key => !params[key] && delete params[key]);
-
-            const res = await axios.get('/api/products', { params });
-            setProducts(res.data);
+            const res = await axios.get('/api/products', { params: buildParams() });
+            setProducts(res.data.items);
+            setNextCursor(res.data.next_cursor);
         } catch (err) {
             console.error(err);
         } finally {
@@ -25,9 +32,33 @@ const HomePage = () => {
         }
     };
 
+    const fetchMore = async () => {
+        if (!nextCursor || loadingMore) return;
+        setLoadingMore(true);
+        try {
+            const res = await axios.get('/api/products', { params: { ...buildParams(), cursor: nextCursor } });
+            setProducts(prev => [...prev, ...res.data.items]);
+            setNextCursor(res.data.next_cursor);
+        } catch (err) {
+            console.error(err);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     useEffect(() => {
         fetchProducts();
-    }, [filters.category, filters.listing_type]); // Auto fetch on main filters
+    }, [filters.category, filters.listing_type, filters.sort]); // Auto fetch on main filters
+
+    // Infinite scroll: load the next page when the bottom of the grid comes into view
+    useEffect(() => {
+        if (!sentinelRef.current || !nextCursor) return;
+        const observer = new IntersectionObserver(entries => {
+            if (entries[0].isIntersecting) fetchMore();
+        }, { rootMargin: '400px' });
+        observer.observe(sentinelRef.current);
+        return () => observer.disconnect();
+    }, [nextCursor, loadingMore]);
 
     const handleSearch = (e) => {
         e.preventDefault();
@@ -78,6 +109,22 @@ const HomePage = () => {
                             <Search size={16} className="absolute left-3 top-2.5 text-slate-500" />
                         </form>
 
+                        {/* Sort */}
+                        <div className="mb-6">
+                            <label className="block text-sm font-bold text-slate-400 mb-2 uppercase">Sort By</label>
+                            <select
+                                className="w-full px-3 py-2 text-sm rounded-lg"
+                                value={filters.sort}
+                                onChange={e => setFilters({ ...filters, sort: e.target.value })}
+                            >
+                                <option value="">{filters.search ? 'Best Match' : 'Newest'}</option>
+                                <option value="oldest">Oldest</option>
+                                <option value="price_asc">Price: Low to High</option>
+                                <option value="price_desc">Price: High to Low</option>
+                                <option value="ending_soon">Ending Soon</option>
+                            </select>
+                        </div>
+
                         {/* Type Filter */}
                         <div className="mb-6">
                             <label className="block text-sm font-bold text-slate-400 mb-2 uppercase">Type</label>
@@ -138,7 +185,7 @@ const HomePage = () => {
                 <div className="flex-1">
                     <div className="mb-6 flex justify-between items-center">
                         <h1 className="text-3xl font-bold">Marketplace</h1>
-                        <span className="text-slate-400">{products.length} Items found</span>
+                        <span className="text-slate-400">{products.length}{nextCursor ? '+' : ''} Items found</span>
                     </div>
 
                     {loading ? (
@@ -153,6 +200,12 @@ const HomePage = () => {
                         </div>
                     )}
 
+                    {!loading && nextCursor && (
+                        <div ref={sentinelRef} className="flex justify-center py-8">
+                            {loadingMore && <div className="animate-spin rounded-full h-8 w-8 border-b-2 border-primary"></div>}
+                        </div>
+                    )}
+
                     {!loading && products.length === 0 && (
                         <div className="text-center py-20 text-slate-500">
                             <p className="text-xl">No products found.</p>
@@ -11,13 +11,31 @@ const ProductDetails = () => {
     const [product, setProduct] = useState(null);
     const [loading, setLoading] = useState(true);
     const [bidAmount, setBidAmount] = useState('');
+    const [quantity, setQuantity] = useState(1);
     const [ws, setWs] = useState(null);
     const [messages, setMessages] = useState([]);
+    const [bidsCursor, setBidsCursor] = useState(null);
+    // Id of the newest bid seen on the stream, so a reconnect only receives what was missed
+    const lastSeq = useRef(null);
+    const socketRef = useRef(null);
 
     useEffect(() => {
         fetchProduct();
+        return () => {
+            // Stop reconnecting once we leave the page
+            if (socketRef.current) {
+                socketRef.current.onclose = null;
+                socketRef.current.close();
+            }
+        };
     }, [id]);
 
+    // Merge bids by id, highest first: stream events and fetched pages can overlap
+    const mergeBids = (prev, incoming) => {
+        const seen = new Set(incoming.map(b => b.id));
+        return [...incoming, ...prev.filter(b => !seen.has(b.id))].sort((a, b) => b.amount - a.amount);
+    };
+
     const fetchProduct = async () => {
         try {
             const res = await axios.get(`/api/products/${id}`);
@@ -33,10 +51,14 @@ const ProductDetails = () => {
         }
     };
 
-    const fetchBids = async () => {
+    const fetchBids = async (cursor = null) => {
         try {
-            const res = await axios.get(`/api/products/${id}/bids`);
-            setMessages(res.data);
+            const res = await axios.get(`/api/products/${id}/bids`, { params: cursor ? { cursor } : {} });
+            setMessages(prev => cursor ? [...prev, ...res.data.items] : mergeBids(prev, res.data.items));
+            if (!cursor && res.data.items.length && lastSeq.current === null) {
+                lastSeq.current = Math.max(...res.data.items.map(b => b.id));
+            }
+            setBidsCursor(res.data.next_cursor);
         } catch (err) {
             console.error("Failed to fetch bids", err);
         }
@@ -61,8 +83,12 @@ const ProductDetails = () => {
             const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
             wsUrl = `${protocol}//${window.location.host}/ws/bids/${id}`;
         }
+        // Coalesced snapshots instead of one message per bid during bidding wars
+        wsUrl += `?mode=snapshot`;
+        if (lastSeq.current !== null) wsUrl += `&since=${lastSeq.current}`;
 
         const socket = new WebSocket(wsUrl);
+        socketRef.current = socket;
 
         socket.onopen = () => {
             console.log('Connected to Auction Stream');
@@ -72,16 +98,36 @@ const ProductDetails = () => {
             try {
                 const msg = JSON.parse(event.data);
                 if (msg.type === 'new_bid' && msg.product_id == id) {
+                    lastSeq.current = Math.max(lastSeq.current || 0, msg.bid_id);
                     setProduct(prev => ({
                         ...prev,
-                        current_highest_bid: msg.amount
+                        current_highest_bid: Math.max(prev.current_highest_bid, msg.amount),
+                        highest_bidder_username: msg.username
                     }));
                     // Add new bid to top of list
-                    setMessages(prev => [{
+                    setMessages(prev => mergeBids(prev, [{
+                        id: msg.bid_id,
                         username: msg.username,
                         amount: msg.amount,
                         timestamp: msg.timestamp
-                    }, ...prev]);
+                    }]));
+                } else if (msg.type === 'snapshot' && msg.product_id == id) {
+                    if (msg.seq !== null) lastSeq.current = Math.max(lastSeq.current || 0, msg.seq);
+                    setProduct(prev => ({
+                        ...prev,
+                        current_highest_bid: Math.max(prev.current_highest_bid, msg.current_highest_bid),
+                        highest_bidder_username: msg.highest_bidder_username || prev.highest_bidder_username,
+                        status: msg.status || prev.status
+                    }));
+                    setMessages(prev => mergeBids(prev, msg.bids));
+                    // Too many bids to carry in one message: reload the history instead
+                    if (msg.truncated) fetchBids();
+                } else if (msg.type === 'auction_closed' && msg.product_id == id) {
+                    setProduct(prev => ({
+                        ...prev,
+                        status: msg.status,
+                        highest_bidder_username: msg.winner_username || prev.highest_bidder_username
+                    }));
                 }
             } catch (e) {
                 // Handle legacy text messages or errors
@@ -89,17 +135,20 @@ const ProductDetails = () => {
             }
         };
 
-        setWs(socket);
+        socket.onclose = () => {
+            // Resume from the last seen bid instead of re-fetching the whole history
+            setTimeout(connectWebSocket, 2000);
+        };
 
-        return () => socket.close();
+        setWs(socket);
     };
 
     const handleBuyNow = async () => {
         if (!user) return navigate('/login');
-        if (!confirm("Confirm purchase?")) return;
+        if (!confirm(quantity > 1 ? `Confirm purchase of ${quantity} units?` : "Confirm purchase?")) return;
 
         try {
-            await axios.post(`/api/products/${id}/buy`);
+            await axios.post(`/api/products/${id}/buy`, { quantity });
             alert("Purchase Successful!");
             navigate('/dashboard');
         } catch (err) {
@@ -228,6 +277,14 @@ const ProductDetails = () => {
                                                 </tbody>
                                             </table>
                                         )}
+                                        {bidsCursor && (
+                                            <button
+                                                onClick={() => fetchBids(bidsCursor)}
+                                                className="w-full py-2 text-xs text-slate-400 hover:text-white border-t border-slate-800"
+                                            >
+                                                Show more bids
+                                            </button>
+                                        )}
                                     </div>
                                 </div>
                             </div>
@@ -238,6 +295,21 @@ const ProductDetails = () => {
                                     <span className="text-4xl font-bold text-emerald-400">₹{product.price}</span>
                                 </div>
 
+                                {product.status === 'active' && product.stock > 1 && (
+                                    <div className="mb-6 flex items-center gap-4">
+                                        <label className="text-slate-400 text-sm uppercase">Quantity</label>
+                                        <input
+                                            type="number"
+                                            min="1"
+                                            max={product.stock}
+                                            value={quantity}
+                                            onChange={e => setQuantity(Math.max(1, Math.min(product.stock, parseInt(e.target.value) || 1)))}
+                                            className="w-24 bg-slate-900 border border-slate-700 rounded-lg px-3 py-2 text-white"
+                                        />
+                                        <span className="text-slate-500 text-sm">{product.stock} available</span>
+                                    </div>
+                                )}
+
                                 {product.status === 'active' && (
                                     <button
                                         onClick={handleBuyNow}